@@ -0,0 +1,1116 @@
+# Space Arena simulation core
+# Everything in here runs without a window or a sound card: the game rules
+# draw through whatever "pen" they are handed and play sounds through the
+# game's audio backend, so a headless world can use NullPen and NullAudio.
+import sys
+import time
+import math
+import random
+import numpy as np
+import collision
+from audio import NullAudio
+from profiler import NullProfiler
+from pool import Pool
+from world import World
+from states import ACTIVE, READY, INACTIVE, EXPLODING
+from spatial import SpatialHash
+from swarm import EnemySwarm, swarm_property
+
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 800
+INFO_WIDTH = 200
+INFO_CENTER = SCREEN_WIDTH / 2
+CAMERA_OFFSET = INFO_WIDTH / 2
+COLLISION_CHECK_RANGE = 300
+
+# Simulation ticks a second. Speeds, fuses, fuel and explosion lengths are
+# all amounts per tick tuned for this rate, so it is fixed: running ticks
+# faster would run the game faster.
+TICK_RATE = 60
+
+game_speed = 0.3
+
+
+def set_game_speed(speed):
+    # Change the game speed along with every speed limit and acceleration
+    # worked out from it (set it before creating a Game)
+    global game_speed
+    game_speed = speed
+    Sprite.acceleration = 0.2 * speed
+    Sprite.max_dx = 5 * speed
+    Sprite.max_dy = 5 * speed
+    Player.max_dx = 10 * speed
+    Player.max_dy = 10 * speed
+
+
+class Game:
+    def __init__(self, width, height, audio=None, high_score=0, scores=None, seed=None):
+        self.width = width
+        self.height = height
+        self.level = 1
+        self.state = "splash"
+        self.tick = 0
+        self.kills = 0
+
+        # Enemies left in this level, spawned or still to come
+        self.enemy_count = 0
+
+        # Types new enemies are picked from, each equally likely (list a
+        # type more than once to make it more common)
+        self.enemy_types = ["hunter", "mine", "surveillance"]
+
+        # Every random choice in the game comes from here, so a seed (and
+        # the same inputs on the same ticks) reproduces a game exactly
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # Backends
+        if audio is None:
+            audio = NullAudio()
+        self.audio = audio
+        self.profiler = NullProfiler()
+
+        # Print the memory used per sprite as each level ends
+        self.report_memory = False
+
+        # High score, and the ScoreKeeper (if any) every new score is passed to
+        self.high_score = high_score
+        self.scores = scores
+
+        # Create player sprite
+        self.player = Player(self)
+
+        # Create missile objects
+        self.missiles = Pool(lambda: Missile(self), 3, 3)
+        self.enemy_missiles = Pool(lambda: EnemyMissile(self), 3, 3)
+
+        # Create bomb object
+        self.bombs = Pool(lambda: Bomb(self), 1, 1)
+
+        self.explosions = Pool(lambda: Explosion(self, 0, 0))
+
+        # Live sprites by kind
+        self.world = World(self.player, self.missiles, self.enemy_missiles, self.bombs, self.explosions)
+
+        # Enemy positions, velocities and health, stepped all at once
+        self.swarm = EnemySwarm(width, height, Enemy.max_dx, Enemy.max_dy, self.rng)
+
+        # Feeds each level's enemies in over several frames
+        self.spawner = Spawner(self)
+
+        # Broadphase for finding the enemies near the player
+        self.grid = SpatialHash(width, height)
+
+    def start_level(self):
+        self.world.clear()
+        self.grid.clear()
+        self.swarm.clear()
+
+        # Add enemies, the first wave now and the rest over the next frames
+        self.enemy_count = 2 ** self.level
+        self.spawner.start(2 ** self.level)
+        self.spawner.update()
+
+        # Add powerups
+        for _ in range(1):
+            x = self.rng.randint(-self.width / 2, self.width / 2)
+            y = self.rng.randint(-self.height / 2, self.height / 2)
+            dx = self.rng.randint(-2, 2) * game_speed
+            dy = self.rng.randint(-2, -2) * game_speed
+            powerup = Powerup(self, x, y, "powerup.gif", "white", "multishot", dx, dy)
+            self.world.powerups.add(powerup)
+
+        for _ in range(1):
+            x = self.rng.randint(-self.width / 2, self.width / 2)
+            y = self.rng.randint(-self.height / 2, self.height / 2)
+            dx = self.rng.randint(-2, 2) * game_speed
+            dy = self.rng.randint(-2, -2) * game_speed
+            powerup = Powerup(self, x, y, "powerup2.gif", "green", "heal", dx, dy)
+            self.world.powerups.add(powerup)
+
+        for _ in range(1):
+            x = self.rng.randint(-self.width / 2, self.width / 2)
+            y = self.rng.randint(-self.height / 2, self.height / 2)
+            dx = self.rng.randint(-2, 2) * game_speed
+            dy = self.rng.randint(-2, -2) * game_speed
+            powerup = Powerup(self, x, y, "powerup3.gif", "yellow", "bomb", dx, dy)
+            self.world.powerups.add(powerup)
+
+    def update(self):
+        player = self.player
+        profiler = self.profiler
+        self.tick += 1
+
+        # Update sprites
+        with profiler.phase("sprite update"):
+            for enemy_missile in self.enemy_missiles.active():
+                enemy_missile.update()
+            player.update()
+            for missile in self.missiles.active():
+                missile.update()
+            for bomb in self.bombs.active():
+                bomb.update()
+            self.swarm.update(player)
+            for powerup in self.world.powerups:
+                powerup.update()
+
+        # Update explosions
+        with profiler.phase("explosion update"):
+            for explosion in self.explosions.active():
+                explosion.update()
+
+        with profiler.phase("collisions"):
+            # Re-bucket enemies that moved into a new cell
+            self.swarm.update_grid(self.grid)
+
+            # Enemy Missile Collisions with Player
+            for enemy_missile in self.enemy_missiles.active():
+                if enemy_missile.is_collision(player):
+                    enemy_missile.reset()
+                    player.health -= 10
+
+            # Only enemies near the player can fire at it or be hit
+            enemies = self.grid.query_range(player.x, player.y, COLLISION_CHECK_RANGE)
+
+        # Fire enemy missiles
+        with profiler.phase("enemy fire"):
+            for enemy in enemies:
+                for _ in range(len(self.enemy_missiles.free)):
+                    if self.rng.random() < 0.01:
+                        # Fire the missile
+                        heading = math.atan2(player.y - enemy.y, player.x - enemy.x)
+                        heading = heading * (180 / 3.14159)
+                        enemy_missile = self.enemy_missiles.acquire()
+                        enemy_missile.fire(enemy.x, enemy.y, heading, enemy.dx, enemy.dy)
+                        break
+
+        with profiler.phase("collisions"):
+            # Check for collisions
+            for enemy in enemies:
+                if player.is_collision(enemy):
+                    enemy.health -= 10
+                    player.health -= 10
+                    player.bounce(enemy)
+
+            # Missiles, bomb and explosions against the nearby enemies
+            if enemies:
+                self.resolve_attacks()
+
+            for powerup in self.world.powerups:
+                if abs(player.x - powerup.x) < COLLISION_CHECK_RANGE and \
+                        abs(player.y - powerup.y) < COLLISION_CHECK_RANGE:
+                    if player.is_collision(powerup):
+                        powerup.reset()
+                    else:
+                        for missile in self.missiles.active():
+                            if missile.state == ACTIVE and missile.is_collision(powerup):
+                                powerup.reset()
+                                missile.reset()
+
+            for explosion in self.explosions.in_use:
+                if explosion.is_collision(player):
+                    player.health -= 5
+
+        # Check for end of level
+        with profiler.phase("spawn"):
+            if self.enemy_count == 0:
+                if self.report_memory:
+                    print("Level {}: {} sprites, {:.0f} bytes per sprite".format(
+                        self.level, len(self.world), self.sprite_memory()))
+                self.level += 1
+                self.start_level()
+            else:
+                self.spawner.update()
+
+    def sprite_memory(self):
+        # Average size of the level's sprites, counting each enemy's share
+        # of the swarm arrays
+        total = self.swarm.slot_size() * self.swarm.count
+        for sprite in self.world:
+            total += sys.getsizeof(sprite)
+        return total / len(self.world)
+
+    def spawn_enemy(self):
+        player = self.player
+
+        # Pick a random location away from the player
+        while True:
+            x = self.rng.randint(-self.width / 2, self.width / 2)
+            y = self.rng.randint(-self.height / 2, self.height / 2)
+            if abs(player.x - x) > COLLISION_CHECK_RANGE or \
+                    abs(player.y - y) > COLLISION_CHECK_RANGE:
+                break
+        dx = self.rng.randint(-2, 2) * game_speed
+        dy = self.rng.randint(-2, -2) * game_speed
+        enemy = Enemy(self, x, y, dx, dy)
+        self.world.enemies.add(enemy)
+        self.grid.insert(enemy)
+
+    def attack_targets(self, attackers):
+        # Enemies near the player (as query_range finds them) whose boxes
+        # overlap the box around all the attackers, in grid order. The box
+        # is clipped to the player's range, widened by the biggest enemy so
+        # that enemies centred just inside it still count.
+        left, bottom = (attackers[:2] - attackers[2:]).min(axis=1).tolist()
+        right, top = (attackers[:2] + attackers[2:]).max(axis=1).tolist()
+        player = self.player
+        reach = COLLISION_CHECK_RANGE + self.grid.max_half_size
+        left = max(left, player.x - reach)
+        right = min(right, player.x + reach)
+        bottom = max(bottom, player.y - reach)
+        top = min(top, player.y + reach)
+        return [enemy for enemy in self.grid.query_aabb(left, bottom, right, top)
+                if abs(player.x - enemy.x) < COLLISION_CHECK_RANGE and
+                abs(player.y - enemy.y) < COLLISION_CHECK_RANGE]
+
+    def resolve_attacks(self):
+        # A missile hits the first enemy it overlaps, in sprite order
+        missiles = self.missiles.active()
+        if missiles:
+            attackers = collision.boxes(missiles)
+            enemies = self.attack_targets(attackers)
+            if enemies:
+                hits = collision.hit_matrix(attackers, collision.boxes(enemies))
+                for e in np.flatnonzero(hits.any(axis=0)):
+                    for m in np.flatnonzero(hits[:, e]):
+                        missile = missiles[m]
+                        if missile.state == ACTIVE:
+                            enemies[e].health -= 10
+                            missile.reset()
+
+        bombs = self.bombs.active()
+        if bombs:
+            attackers = collision.boxes(bombs)
+            enemies = self.attack_targets(attackers)
+            if enemies:
+                hits = collision.hit_matrix(attackers, collision.boxes(enemies))
+                for b in np.flatnonzero(hits.any(axis=1)):
+                    bombs[b].fuse = 0
+
+        # Every explosion an enemy is inside takes 5 health
+        explosions = self.explosions.active()
+        if explosions:
+            attackers = collision.boxes(explosions)
+            enemies = self.attack_targets(attackers)
+            if enemies:
+                hits = collision.hit_matrix(attackers, collision.boxes(enemies))
+                slots = np.array([enemy.index for enemy in enemies])
+                self.swarm.health[slots] -= 5 * hits.sum(axis=0)
+
+    def render(self, pen, camera, alpha=1.0):
+        # Render sprites; between ticks each one is drawn alpha of the way
+        # through its last move by shifting the offset back along its velocity
+        with self.profiler.phase("render"):
+            lag = 1.0 - alpha
+            world = self.world
+            for kind in (world.enemy_missiles, (self.player,), world.missiles, world.bombs):
+                for sprite in kind:
+                    sprite.render(pen, camera.x + sprite.dx * lag, camera.y + sprite.dy * lag)
+            self.render_enemies(pen, camera, lag)
+            for sprite in world.powerups:
+                sprite.render(pen, camera.x + sprite.dx * lag, camera.y + sprite.dy * lag)
+            pen.flush()
+
+            # Render explosions
+            for explosion in self.explosions.in_use:
+                explosion.render(pen, camera.x, camera.y)
+
+        with self.profiler.phase("border"):
+            self.render_border(pen, camera.x, camera.y)
+
+    def render_enemies(self, pen, camera, lag):
+        # Find the enemies in view from the swarm arrays in one pass, and
+        # draw them from the array values instead of through their properties
+        swarm = self.swarm
+        n = swarm.count
+        x = swarm.x[:n] - (camera.x + swarm.dx[:n] * lag)
+        y = swarm.y[:n] - (camera.y + swarm.dy[:n] * lag)
+        visible = np.flatnonzero((swarm.state[:n] == ACTIVE) & (np.abs(x + CAMERA_OFFSET) <= SCREEN_WIDTH / 2) &
+                                 (np.abs(y) <= SCREEN_HEIGHT / 2))
+        enemies = swarm.enemies
+        for i, ex, ey, heading, health in zip(visible.tolist(), x[visible].tolist(), y[visible].tolist(),
+                                              swarm.heading[visible].tolist(), swarm.health[visible].tolist()):
+            enemies[i].draw(pen, ex, ey, heading, health)
+
+    def render_border(self, pen, x_offset, y_offset):
+        pen.color("white")
+        pen.width(3)
+        pen.penup()
+
+        left = -self.width / 2.0 - x_offset
+        right = self.width / 2.0 - x_offset
+        top = self.height / 2.0 - y_offset
+        bottom = -self.height / 2.0 - y_offset
+
+        pen.goto(left, top)
+        pen.pendown()
+        pen.goto(right, top)
+        pen.goto(right, bottom)
+        pen.goto(left, bottom)
+        pen.goto(left, top)
+        pen.penup()
+
+    def start(self):
+        self.state = "playing"
+
+    def print_pool_stats(self):
+        print("Missiles:           {}".format(self.missiles.stats()))
+        print("Enemy Missiles:     {}".format(self.enemy_missiles.stats()))
+        print("Bombs:              {}".format(self.bombs.stats()))
+        print("Explosions:         {}".format(self.explosions.stats()))
+        print("Enemy AI:           {}".format(self.swarm.lod_stats()))
+
+
+class Spawner:
+    # Spawns a level's enemies in waves: at most wave_size per frame, never
+    # more than max_active alive at once, and (if time_budget is set) no
+    # more spawning in a frame once that many seconds have been spent
+    def __init__(self, game, wave_size=32, max_active=512, time_budget=None):
+        self.game = game
+        self.wave_size = wave_size
+        self.max_active = max_active
+        self.time_budget = time_budget
+        self.remaining = 0
+
+    def start(self, total):
+        self.remaining = total
+
+    def active(self):
+        # Spawned and not yet destroyed
+        return self.game.enemy_count - self.remaining
+
+    def update(self):
+        start = time.perf_counter()
+        spawned = 0
+        while self.remaining > 0 and spawned < self.wave_size and self.active() < self.max_active:
+            self.game.spawn_enemy()
+            self.remaining -= 1
+            spawned += 1
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                break
+
+
+class Sprite:
+    # What every sprite has. Position, velocity, heading, health and state
+    # come from the subclass: Body gives them slots of their own and Enemy
+    # keeps them in the swarm arrays.
+    __slots__ = ("game", "shape", "color", "score")
+
+    # Shared by every sprite of a class
+    acceleration = 0.2 * game_speed
+    max_health = 100
+    width = 20
+    height = 20
+    max_dx = 5 * game_speed
+    max_dy = 5 * game_speed
+    on_screen = True
+
+    # Constructor
+    def __init__(self, game, x, y, shape, color, dx=0.0, dy=0.0):
+        self.game = game
+        self.x = x
+        self.y = y
+        self.shape = shape
+        self.color = color
+        self.dx = dx
+        self.dy = dy
+        self.heading = 0
+        self.da = 0
+        self.thrust = 0.0
+        self.health = self.max_health
+        self.state = ACTIVE
+        self.score = 0
+
+    def is_collision(self, other):
+        if self.on_screen and self.x - self.width / 2 < other.x + other.width / 2 and \
+                self.x + self.width / 2 > other.x - other.width / 2 and \
+                self.y - self.height / 2 < other.y + other.height / 2 and \
+                self.y + self.height / 2 > other.y - other.width / 2:
+            return True
+        else:
+            return False
+
+    def bounce(self, other):
+        temp_dx = self.dx
+        temp_dy = self.dy
+
+        self.dx = other.dx
+        self.dy = other.dy
+
+        other.dx = temp_dx
+        other.dy = temp_dy
+
+    def update(self):
+        self.heading += self.da
+        self.heading %= 360
+
+        self.dx += math.cos(math.radians(self.heading)) * self.thrust
+        self.dy += math.sin(math.radians(self.heading)) * self.thrust
+
+        self.x += self.dx
+        self.y += self.dy
+
+        self.border_check()
+
+    def border_check(self):
+        game = self.game
+        if self.x > game.width / 2.0 - 10:
+            self.x = game.width / 2.0 - 10
+            self.dx *= -1
+
+        elif self.x < -game.width / 2.0 + 10:
+            self.x = -game.width / 2.0 + 10
+            self.dx *= -1
+
+        if self.y > game.height / 2.0 - 10:
+            self.y = game.height / 2.0 - 10
+            self.dy *= -1
+
+        elif self.y < -game.height / 2.0 + 10:
+            self.y = -game.height / 2.0 + 10
+            self.dy *= -1
+
+    def is_on_screen(self, x_offset, y_offset):
+        if self.state != ACTIVE:
+            return False
+        x = self.x - x_offset + CAMERA_OFFSET
+        if abs(x) > SCREEN_WIDTH / 2:
+            return False
+        y = self.y - y_offset
+        if abs(y) > SCREEN_HEIGHT / 2:
+            return False
+        return True
+
+    def render(self, pen, x_offset, y_offset):
+        if self.is_on_screen(x_offset, y_offset):
+            self.draw(pen, self.x - x_offset, self.y - y_offset, self.heading, self.health)
+
+    def draw(self, pen, x, y, heading, health):
+        # Stamp the sprite at screen position (x, y) with its health meter
+        pen.goto(x, y)
+        pen.setheading(heading)
+        pen.shape(self.shape)
+        pen.color(self.color)
+        pen.stamp()
+
+        self.render_health_meter(pen, x, y, health)
+
+    def render_health_meter(self, pen, x, y, health):
+        # Draw health meter under the sprite at screen position (x, y)
+        max_health = self.max_health
+        pen.goto(x - 10, y + 20)
+        pen.width(3)
+        pen.pendown()
+        pen.setheading(0)
+
+        if health / max_health < 0.3:
+            pen.color("red")
+        elif health / max_health < 0.7:
+            pen.color("yellow")
+        else:
+            pen.color("green")
+
+        pen.fd(20.0 * (health / max_health))
+
+        if health != max_health:
+            pen.color("grey")
+            pen.fd(20.0 * ((max_health - health) / max_health))
+
+        pen.penup()
+
+    def explode(self, max_size=60):
+        self.game.audio.play("Explosion+7.wav")
+        explosion = self.game.explosions.acquire()
+        if explosion is not None:
+            explosion.reset(self.x, self.y)
+            explosion.max_size = max_size
+
+
+class Body(Sprite):
+    __slots__ = ("x", "y", "dx", "dy", "heading", "da", "thrust", "health", "state")
+
+
+class Player(Body):
+    __slots__ = ("explode_count", "lives", "multishot", "bombs")
+
+    max_dx = 10 * game_speed
+    max_dy = 10 * game_speed
+
+    def __init__(self, game):
+        Sprite.__init__(self, game, 0, 0, "triangle", "white")
+        self.explode_count = 0
+        self.lives = 3
+        self.score = 0
+        self.heading = 90
+        self.da = 0
+        self.multishot = 0
+        self.bombs = 0
+
+    def rotate_left(self):
+        self.da = 5
+
+    def rotate_right(self):
+        self.da = -5
+
+    def stop_rotation(self):
+        self.da = 0
+
+    def accelerate(self):
+        self.thrust += self.acceleration
+
+    def decelerate(self):
+        self.thrust = 0.0
+
+    def drop_bomb(self):
+        if self.bombs > 0:
+            bomb = self.game.bombs.acquire()
+            if bomb is not None:
+                bomb.fire(self.x, self.y)
+                self.bombs -= 1
+
+    def fire(self):
+        missiles = self.game.missiles
+        num_of_missiles = len(missiles.free)
+        if num_of_missiles == 0:
+            return
+
+        self.game.audio.play("Flash-laser-03.wav")
+        if self.multishot > 0:
+            self.multishot -= 1
+        else:
+            num_of_missiles = 1
+
+        # 1 missile ready
+        if num_of_missiles == 1:
+            directions = [0]
+
+        # 2 missiles ready
+        elif num_of_missiles == 2:
+            directions = [-3, 3]
+
+        # 3 missiles ready
+        else:
+            directions = [0, -5, 5]
+
+        while directions:
+            missile = missiles.acquire()
+            missile.fire(self.x, self.y, self.heading + directions.pop(), self.dx, self.dy)
+
+    def update(self):
+        if self.state == ACTIVE:
+            self.heading += self.da
+            self.heading %= 360
+
+            self.dx += math.cos(math.radians(self.heading)) * self.thrust
+            self.dy += math.sin(math.radians(self.heading)) * self.thrust
+
+            # Set max speed
+            if self.dx > self.max_dx:
+                self.dx = self.max_dx
+            elif self.dx < -self.max_dx:
+                self.dx = -self.max_dx
+
+            if self.dy > self.max_dy:
+                self.dy = self.max_dy
+            elif self.dy < -self.max_dy:
+                self.dy = -self.max_dy
+
+            self.x += self.dx
+            self.y += self.dy
+
+            self.border_check()
+
+            # Check health
+            if self.health <= 0:
+                self.state = EXPLODING
+                self.explode_count = 60
+                self.color = "black"
+                self.explode()
+
+        elif self.state == EXPLODING:
+            self.explode_count -= 1
+            if self.explode_count <= 0:
+                self.reset()
+
+    def reset(self):
+        game = self.game
+        self.lives -= 1
+        if self.lives > 0:
+            # Pick a random spot in a cell well clear of every enemy
+            cell_size = 100
+            clearance = game.swarm.clearance(cell_size)
+            cells = np.argwhere(clearance >= COLLISION_CHECK_RANGE / cell_size + 1)
+            if len(cells) > 0:
+                col, row = cells[game.rng.randrange(len(cells))]
+                left = int(col * cell_size - game.width / 2)
+                bottom = int(row * cell_size - game.height / 2)
+                self.x = game.rng.randint(left, left + cell_size)
+                self.y = game.rng.randint(bottom, bottom + cell_size)
+            else:
+                # Nowhere is that clear, so take the middle of a cell
+                # with the largest clearance there is
+                cells = np.argwhere(clearance == clearance.max())
+                col, row = cells[game.rng.randrange(len(cells))]
+                self.x = (col.item() + 0.5) * cell_size - game.width / 2
+                self.y = (row.item() + 0.5) * cell_size - game.height / 2
+
+            # Enemies only drifting while the player was far away may be
+            # near the new spot
+            game.swarm.wake()
+            self.health = self.max_health
+            self.heading = 90
+            self.dx = 0
+            self.dy = 0
+            self.state = ACTIVE
+            self.color = "white"
+        else:
+            game.state = "game over"
+
+    def render(self, pen, x_offset, y_offset):
+        if self.thrust > 0:
+            # Render rocket fire
+            flame = self.thrust / 2.0
+            x = self.x - 10 * math.cos(math.radians(self.heading))
+            y = self.y - 10 * math.sin(math.radians(self.heading))
+            if flame > 0.5:
+                flame = 0.5
+            pen.shapesize(0.2, flame, None)
+            pen.goto(x - x_offset, y - y_offset)
+            pen.setheading(self.heading + 180)
+            pen.shape("triangle")
+            pen.color("yellow")
+            pen.stamp()
+        pen.shapesize(0.5, 1.0, None)
+        pen.goto(self.x - x_offset, self.y - y_offset)
+        pen.setheading(self.heading)
+        pen.shape(self.shape)
+        pen.color(self.color)
+        pen.stamp()
+
+        pen.shapesize(1.0, 1.0, None)
+
+        self.render_health_meter(pen, self.x - x_offset, self.y - y_offset, self.health)
+
+
+class Missile(Body):
+    __slots__ = ("fuel",)
+
+    max_fuel = 200
+    width = 4
+    height = 4
+
+    def __init__(self, game):
+        Sprite.__init__(self, game, 0, 0, "circle", "yellow")
+        self.state = READY
+        self.thrust = 8.0
+        self.fuel = Missile.max_fuel
+
+    def fire(self, x, y, heading, dx, dy):
+        if self.state == READY:
+            self.state = ACTIVE
+            self.x = x
+            self.y = y
+            self.heading = heading
+            self.dx = dx
+            self.dy = dy
+
+            self.dx += math.cos(math.radians(self.heading)) * self.thrust
+            self.dy += math.sin(math.radians(self.heading)) * self.thrust
+
+    def update(self):
+        if self.state == ACTIVE:
+            self.fuel -= self.thrust
+            if self.fuel <= 0:
+                self.reset()
+
+            self.heading += self.da
+            self.heading %= 360
+
+            self.x += self.dx
+            self.y += self.dy
+
+            self.border_check()
+
+    def reset(self):
+        if self.state == ACTIVE:
+            self.game.missiles.release(self)
+        self.fuel = Missile.max_fuel
+        self.dx = 0
+        self.dy = 0
+        self.state = READY
+
+    def render(self, pen, x_offset, y_offset):
+        if self.is_on_screen(x_offset, y_offset):
+            pen.shapesize(0.2, 0.2, None)
+            pen.goto(self.x - x_offset, self.y - y_offset)
+            pen.setheading(self.heading)
+            pen.shape(self.shape)
+            pen.color(self.color)
+            pen.stamp()
+
+            pen.shapesize(1.0, 1.0, None)
+
+
+class Bomb(Body):
+    __slots__ = ("fuse",)
+
+    max_fuse = 50
+    width = 10
+    height = 10
+
+    def __init__(self, game):
+        Sprite.__init__(self, game, 0, 0, "bomb.gif", "yellow")
+        self.state = READY
+        self.thrust = 8.0
+        self.fuse = Bomb.max_fuse
+
+    def fire(self, x, y):
+        if self.state == READY:
+            self.state = ACTIVE
+            self.x = x
+            self.y = y
+
+    def update(self):
+        if self.state == ACTIVE:
+            self.fuse -= 1
+            if self.fuse <= 0:
+                self.reset()
+                self.explode(200)
+
+    def reset(self):
+        if self.state == ACTIVE:
+            self.game.bombs.release(self)
+        self.fuse = Bomb.max_fuse
+        self.state = READY
+
+    def render(self, pen, x_offset, y_offset):
+        if self.is_on_screen(x_offset, y_offset):
+            pen.goto(self.x - x_offset, self.y - y_offset)
+            pen.shape(self.shape)
+            pen.color(self.color)
+            pen.stamp()
+
+
+class EnemyMissile(Body):
+    __slots__ = ("fuel",)
+
+    max_fuel = 200
+    width = 4
+    height = 4
+
+    def __init__(self, game):
+        Sprite.__init__(self, game, 0, 0, "circle", "red")
+        self.state = READY
+        self.thrust = 8.0
+        self.fuel = EnemyMissile.max_fuel
+
+    def fire(self, x, y, heading, dx, dy):
+        if self.state == READY:
+            self.game.audio.play("Flash-laser-02.wav")
+            self.state = ACTIVE
+            self.x = x
+            self.y = y
+            self.heading = heading
+            self.dx = dx
+            self.dy = dy
+
+            self.dx += math.cos(math.radians(self.heading)) * self.thrust
+            self.dy += math.sin(math.radians(self.heading)) * self.thrust
+
+    def update(self):
+        if self.state == ACTIVE:
+            self.fuel -= self.thrust
+            if self.fuel <= 0:
+                self.reset()
+
+            self.heading += self.da
+            self.heading %= 360
+
+            self.x += self.dx
+            self.y += self.dy
+
+            self.border_check()
+
+    def reset(self):
+        if self.state == ACTIVE:
+            self.game.enemy_missiles.release(self)
+        self.fuel = EnemyMissile.max_fuel
+        self.dx = 0
+        self.dy = 0
+        self.state = READY
+
+    def render(self, pen, x_offset, y_offset):
+        if self.is_on_screen(x_offset, y_offset):
+            pen.shapesize(0.2, 0.2, None)
+            pen.goto(self.x - x_offset, self.y - y_offset)
+            pen.setheading(self.heading)
+            pen.shape(self.shape)
+            pen.color(self.color)
+            pen.stamp()
+
+            pen.shapesize(1.0, 1.0, None)
+
+
+class Explosion(Body):
+    # Explosions grow, so their size is per instance
+    __slots__ = ("time", "max_size", "width", "height")
+
+    max_time = 10
+    colors = ["yellow", "orange", "red", "dark red"]
+
+    def __init__(self, game, x, y):
+        Sprite.__init__(self, game, x, y, "circle", "yellow")
+        self.time = 0
+        self.max_size = 60
+        self.width = 20
+        self.height = 20
+        self.state = READY
+
+    def reset(self, x, y):
+        self.x = x
+        self.y = y
+        self.time = 0
+        self.width = 20
+        self.height = 20
+        self.state = ACTIVE
+
+    def update(self):
+        if self.state == ACTIVE:
+            self.time += 1
+            self.width = 20 + (self.max_size - 20) * self.time / self.max_time
+            self.height = self.width
+            if self.time >= self.max_time:
+                self.state = READY
+                self.game.explosions.release(self)
+
+    def render(self, pen, x_offset, y_offset):
+        if self.state == ACTIVE:
+            if self.is_on_screen(x_offset, y_offset):
+                i = len(self.colors) * self.time // (self.max_time + 1)
+                size = self.width / 20
+                pen.shapesize(size, size, None)
+                pen.goto(self.x - x_offset, self.y - y_offset)
+                pen.shape(self.shape)
+                pen.color(self.colors[i])
+                pen.stamp()
+
+                pen.shapesize(1.0, 1.0, None)
+
+
+class Enemy(Sprite):
+    __slots__ = ("swarm", "index", "type")
+
+    max_health = 20
+
+    # Kinematics and health live in the game's EnemySwarm
+    x = swarm_property("x")
+    y = swarm_property("y")
+    dx = swarm_property("dx")
+    dy = swarm_property("dy")
+    heading = swarm_property("heading")
+    da = swarm_property("da")
+    thrust = swarm_property("thrust")
+    health = swarm_property("health")
+    state = swarm_property("state")
+
+    def __init__(self, game, x, y, dx, dy):
+        self.type = game.rng.choice(game.enemy_types)
+        self.swarm = game.swarm
+        self.index = self.swarm.add(self, self.type)
+        if self.type == "hunter":
+            Sprite.__init__(self, game, x, y, "hunter.gif", "red", dx, dy)
+            self.score = 10
+        elif self.type == "mine":
+            Sprite.__init__(self, game, x, y, "mine.gif", "orange", dx, dy)
+            self.score = 5
+        else:
+            Sprite.__init__(self, game, x, y, "surveillance.gif", "pink", dx, dy)
+            self.score = 5
+
+    def update(self):
+        # Enemies are moved and steered all at once by EnemySwarm.update
+        pass
+
+    def reset(self):
+        game = self.game
+        player = game.player
+        self.state = INACTIVE
+        game.grid.remove(self)
+        game.world.enemies.remove(self)
+        game.enemy_count -= 1
+        game.kills += 1
+        self.explode()
+        game.swarm.remove(self)
+        player.score += self.score
+        if player.score % 500 < self.score:
+            game.audio.play("powerup.wav")
+            player.lives += 1
+        if player.score > game.high_score:
+            game.high_score = player.score
+        if game.scores is not None:
+            game.scores.update(player.score, game.level)
+
+
+class Powerup(Body):
+    __slots__ = ("type",)
+
+    # Most multishots and bombs the player can hold
+    max_multishot = 50
+    max_bombs = 1
+
+    def __init__(self, game, x, y, shape, color, type, dx, dy):
+        Sprite.__init__(self, game, x, y, shape, color, dx, dy)
+        self.type = type
+
+    def reset(self):
+        game = self.game
+        player = game.player
+        game.audio.play("powerup.wav")
+        if self.type == "multishot":
+            player.multishot += 20
+            if player.multishot > self.max_multishot:
+                player.multishot = self.max_multishot
+        elif self.type == "heal":
+            player.health += 50
+            if player.health > player.max_health:
+                player.health = player.max_health
+        else:  # bomb
+            player.bombs += 1
+            if player.bombs > self.max_bombs:
+                player.bombs = self.max_bombs
+
+        self.x = game.rng.randint(-game.width / 2, game.width / 2)
+        self.y = game.rng.randint(-game.height / 2, game.height / 2)
+
+
+class Camera:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def update(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Radar:
+    # Blip colour for each swarm type code
+    enemy_colors = ("red", "orange", "pink")
+
+    def __init__(self, x, y, radius, refresh_rate=10, max_blips=200):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.range = 1000
+
+        # Blips are recomputed refresh_rate times a second (every frame if
+        # None) and restamped from the last refresh in between
+        self.refresh_rate = refresh_rate
+        self.max_blips = max_blips
+        self.last_refresh = None
+        self.refreshes = 0
+        self.blips = []
+
+    def render(self, pen, player, world):
+        now = time.perf_counter()
+        if self.refresh_rate is None or self.last_refresh is None or \
+                now - self.last_refresh >= 1.0 / self.refresh_rate:
+            self.refresh(player, world)
+            self.last_refresh = now
+
+        # Draw radar circle
+        pen.color("white")
+        pen.setheading(90)
+        pen.goto(self.x + self.radius, self.y)
+        pen.pendown()
+        pen.circle(self.radius)
+        pen.penup()
+
+        # Draw sprites
+        pen.shape("circle")
+        pen.shapesize(0.1, 0.1, None)
+        for x, y, color in self.blips:
+            pen.goto(x, y)
+            pen.color(color)
+            pen.stamp()
+
+    def refresh(self, player, world):
+        # Enemies straight from the swarm arrays, everything else gathered
+        # into small arrays alongside them
+        swarm = player.game.swarm
+        n = swarm.count
+        live = swarm.state[:n] == ACTIVE
+        colors = list(Radar.enemy_colors)
+        xs = [swarm.x[:n][live]]
+        ys = [swarm.y[:n][live]]
+        codes = [swarm.type[:n][live]]
+
+        others = [sprite for kind in (world.enemy_missiles, (player,), world.missiles, world.bombs,
+                                      world.powerups)
+                  for sprite in kind if sprite.state == ACTIVE]
+        if others:
+            xs.append(np.array([sprite.x for sprite in others], dtype=np.float64))
+            ys.append(np.array([sprite.y for sprite in others], dtype=np.float64))
+            other_codes = []
+            for sprite in others:
+                if sprite.color not in colors:
+                    colors.append(sprite.color)
+                other_codes.append(colors.index(sprite.color))
+            codes.append(np.array(other_codes, dtype=np.int64))
+
+        # Make sure the sprites are close to the player
+        dx = np.concatenate(xs) - player.x
+        dy = np.concatenate(ys) - player.y
+        codes = np.concatenate(codes)
+        near = dx * dx + dy * dy < self.range * self.range
+        scale = self.radius / self.range
+        x = self.x + dx[near] * scale
+        y = self.y + dy[near] * scale
+        codes = codes[near]
+
+        if len(x) > self.max_blips:
+            x, y, codes = self.merge(x, y, codes)
+
+        self.blips = [(bx, by, colors[code]) for bx, by, code in zip(x.tolist(), y.tolist(), codes.tolist())]
+        self.refreshes += 1
+
+    def merge(self, x, y, codes):
+        # Collapse blips of the same colour sharing a cell of the radar into
+        # one at their average position, doubling the cell size until no
+        # more than max_blips are left, so crowded areas thin out first
+        size = 2.0
+        while True:
+            keys = np.stack((np.floor(x / size), np.floor(y / size), codes), axis=1)
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+            if len(unique) <= self.max_blips:
+                break
+            size *= 2
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse)
+        return np.bincount(inverse, x) / counts, np.bincount(inverse, y) / counts, \
+            unique[:, 2].astype(np.int64)
+
+
+# Headless run: tick a world with no window and no sound as fast as possible
+if __name__ == "__main__":
+    from renderer import NullPen
+
+    game = Game(2000, 2000)
+    game.start_level()
+    game.start()
+    camera = Camera(game.player.x + CAMERA_OFFSET, game.player.y)
+    pen = NullPen()
+
+    ticks = 0
+    start = time.perf_counter()
+    while game.state != "game over" and ticks < 10000:
+        game.update()
+        camera.update(game.player.x + CAMERA_OFFSET, game.player.y)
+        game.render(pen, camera)
+        ticks += 1
+    elapsed = time.perf_counter() - start
+    print("Ticks:          {}".format(ticks))
+    print("Level:          {}".format(game.level))
+    print("Ticks / second: {:.0f}".format(ticks / elapsed))
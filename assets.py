@@ -0,0 +1,206 @@
+# Space Arena asset bundle
+# The images and sounds listed in assets.json packed into one file, with
+# sounds stored already decoded (float32 stereo at the manifest's rate) so
+# loading them is a memory map instead of opening and decoding each WAV.
+# The bundle records the size and modification time of every source file
+# and is rebuilt when any of them changes.
+#
+#   python assets.py            build the bundle and report cold vs warm load times
+#
+# Layout: 8 byte magic, 4 byte little-endian index length, the JSON index,
+# then each asset's data, every one starting on a 64 byte boundary.
+import os
+import json
+import mmap
+import time
+import base64
+import struct
+import tkinter
+import numpy as np
+from audio import decode_wav
+
+MAGIC = b"SABNDL01"
+ALIGN = 64
+
+
+def align(position):
+    return -(-position // ALIGN) * ALIGN
+
+
+def read_manifest(filename="assets.json"):
+    manifest_file = open(filename)
+    manifest = json.load(manifest_file)
+    manifest_file.close()
+    return manifest
+
+
+def source_stamp(filename):
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build_bundle(filename="assets.bundle", manifest_filename="assets.json"):
+    manifest = read_manifest(manifest_filename)
+    rate = manifest["rate"]
+    blobs = []
+    for name in manifest["images"]:
+        image_file = open(name, "rb")
+        blobs.append((name, {"kind": "image"}, image_file.read()))
+        image_file.close()
+    for name in manifest["sounds"]:
+        samples = decode_wav(name, rate)
+        if samples is None:
+            raise ValueError("can't decode {}".format(name))
+        blobs.append((name, {"kind": "sound", "rate": rate, "frames": len(samples)}, samples.tobytes()))
+
+    sources = {}
+    for name in manifest["images"] + manifest["sounds"] + [manifest_filename]:
+        sources[name] = source_stamp(name)
+
+    # Offsets are from the start of the data, the first aligned byte
+    # after the index
+    assets = {}
+    position = 0
+    for name, entry, data in blobs:
+        entry["offset"] = position
+        entry["length"] = len(data)
+        assets[name] = entry
+        position = align(position + len(data))
+    index_bytes = json.dumps({"sources": sources, "assets": assets}).encode()
+    data_start = align(len(MAGIC) + 4 + len(index_bytes))
+
+    # Write under a temporary name so a half-built bundle is never opened
+    temp_filename = filename + ".tmp"
+    bundle_file = open(temp_filename, "wb")
+    bundle_file.write(MAGIC)
+    bundle_file.write(struct.pack("<I", len(index_bytes)))
+    bundle_file.write(index_bytes)
+    for name, entry, data in blobs:
+        bundle_file.write(b"\0" * (data_start + entry["offset"] - bundle_file.tell()))
+        bundle_file.write(data)
+    bundle_file.close()
+    os.replace(temp_filename, filename)
+
+
+class AssetBundle:
+    def __init__(self, filename="assets.bundle"):
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("{} is not an asset bundle".format(filename))
+        length = struct.unpack_from("<I", self.map, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        self.index = json.loads(self.map[start:start + length])
+        self.assets = self.index["assets"]
+        self.data_start = align(start + length)
+
+    def __contains__(self, name):
+        return name in self.assets
+
+    def is_stale(self):
+        # True if any source file changed since the bundle was built
+        for name, stamp in self.index["sources"].items():
+            try:
+                if source_stamp(name) != stamp:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def image(self, name):
+        # The image file's bytes
+        entry = self.assets[name]
+        offset = self.data_start + entry["offset"]
+        return self.map[offset:offset + entry["length"]]
+
+    def has_sound(self, name, rate):
+        entry = self.assets.get(name)
+        return entry is not None and entry["kind"] == "sound" and entry["rate"] == rate
+
+    def sound(self, name):
+        # Read-only float32 stereo samples straight out of the mapped file
+        entry = self.assets[name]
+        samples = np.frombuffer(self.map, dtype=np.float32, count=entry["length"] // 4,
+                                offset=self.data_start + entry["offset"])
+        return samples.reshape(-1, 2)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def load_bundle(filename="assets.bundle", manifest_filename="assets.json"):
+    # The bundle, rebuilt first if it is missing or out of date, or None if
+    # it can't be built (the game then loads the loose files)
+    try:
+        try:
+            bundle = AssetBundle(filename)
+            if not bundle.is_stale():
+                return bundle
+            bundle.close()
+        except (OSError, ValueError):
+            pass
+        build_bundle(filename, manifest_filename)
+        return AssetBundle(filename)
+    except (OSError, ValueError):
+        return None
+
+
+def load_time(manifest, image, sound):
+    # Seconds to load every asset the way the game does: each image made
+    # into a PhotoImage (just read without a display) and each sound's
+    # samples summed, so nothing is left mapped but unread
+    start = time.perf_counter()
+    for name in manifest["images"]:
+        image(name)
+    for name in manifest["sounds"]:
+        sound(name).sum()
+    return time.perf_counter() - start
+
+
+# Cold (loose files) versus warm (bundle) load times
+if __name__ == "__main__":
+    manifest = read_manifest()
+
+    start = time.perf_counter()
+    build_bundle()
+    build_time = time.perf_counter() - start
+
+    try:
+        root = tkinter.Tk()
+        root.withdraw()
+    except tkinter.TclError:
+        root = None
+
+    def loose_image(name):
+        if root is not None:
+            return tkinter.PhotoImage(master=root, file=name)
+        image_file = open(name, "rb")
+        data = image_file.read()
+        image_file.close()
+        return data
+
+    def loose_sound(name):
+        return decode_wav(name, manifest["rate"])
+
+    loose_time = load_time(manifest, loose_image, loose_sound)
+
+    def bundle_image(name):
+        if root is not None:
+            return tkinter.PhotoImage(master=root, data=base64.b64encode(bundle.image(name)))
+        return bundle.image(name)
+
+    def bundle_sound(name):
+        return bundle.sound(name)
+
+    start = time.perf_counter()
+    bundle = load_bundle()
+    bundle_time = time.perf_counter() - start + load_time(manifest, bundle_image, bundle_sound)
+
+    print("Bundle:       {} ({:.0f} KB, built in {:.1f} ms)".format(
+        "assets.bundle", os.path.getsize("assets.bundle") / 1024, build_time * 1000))
+    print("Cold start:   {:.2f} ms (loose files)".format(loose_time * 1000))
+    print("Warm start:   {:.2f} ms (bundle)".format(bundle_time * 1000))
+    if root is None:
+        print("No display, so the images were read but not decoded")
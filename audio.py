@@ -0,0 +1,231 @@
+# Space Arena audio backends
+# The game only ever calls audio.play(filename); pick the backend that suits
+# the platform (or NullAudio when there is no sound at all).
+#
+# Mixer loads every sound into memory up front. play() just queues the
+# name, and a background thread mixes the playing sounds (at most
+# max_voices, the oldest making way for new ones) into blocks for a sink:
+# the sound card through sounddevice, or a WAV file for headless runs.
+# Sounds come ready decoded from the asset bundle when one is given.
+import time
+import wave
+import threading
+from collections import deque
+import numpy as np
+
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+# Needs the PortAudio library as well as the package
+try:
+    import sounddevice
+except (ImportError, OSError):
+    sounddevice = None
+
+SOUNDS = ("explosion.wav", "Explosion+1.wav", "Explosion+7.wav", "Flash-laser-02.wav",
+          "Flash-laser-03.wav", "missile_fire.wav", "powerup.wav", "thruster.wav")
+
+
+class NullAudio:
+    def play(self, filename):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return "no sound"
+
+
+class WinsoundAudio:
+    def play(self, filename):
+        winsound.PlaySound(filename, winsound.SND_ASYNC)
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return "winsound"
+
+
+class WavSink:
+    # Writes the mixed sound to a WAV file, in real time
+    blocking = False
+
+    def __init__(self, filename, rate):
+        self.file = wave.open(filename, "wb")
+        self.file.setnchannels(2)
+        self.file.setsampwidth(2)
+        self.file.setframerate(rate)
+
+    def write(self, data):
+        self.file.writeframes(data)
+
+    def close(self):
+        self.file.close()
+
+
+class DeviceSink:
+    # Plays the mixed sound; write() blocks until the device wants more
+    blocking = True
+
+    def __init__(self, rate):
+        self.stream = sounddevice.RawOutputStream(samplerate=rate, channels=2, dtype="int16")
+        self.stream.start()
+
+    def write(self, data):
+        self.stream.write(data)
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+def decode_wav(filename, rate):
+    # Samples as float32 stereo at the given rate, or None if the file
+    # can't be read
+    try:
+        wav_file = wave.open(filename, "rb")
+    except (OSError, EOFError, wave.Error):
+        return None
+    channels = wav_file.getnchannels()
+    width = wav_file.getsampwidth()
+    file_rate = wav_file.getframerate()
+    data = wav_file.readframes(wav_file.getnframes())
+    wav_file.close()
+
+    if width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+    else:
+        return None
+    samples = samples.reshape(-1, channels)
+    if channels == 1:
+        samples = np.repeat(samples, 2, axis=1)
+    else:
+        samples = samples[:, :2]
+
+    if file_rate != rate:
+        n = int(len(samples) * rate / file_rate)
+        source = np.arange(len(samples))
+        target = np.linspace(0, len(samples) - 1, n)
+        samples = np.stack([np.interp(target, source, samples[:, i]) for i in range(2)], axis=1)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+class Mixer:
+    def __init__(self, sink, sounds=SOUNDS, rate=44100, max_voices=8, block_size=1024, volume=0.5,
+                 start=True, bundle=None):
+        self.sink = sink
+        self.bundle = bundle
+        self.rate = rate
+        self.max_voices = max_voices
+        self.block_size = block_size
+        self.volume = volume
+        self.sounds = {}
+        for filename in sounds:
+            self.sounds[filename] = self.load(filename)
+
+        # Filled by play() on the game thread, emptied by the mixing thread
+        self.requests = deque()
+        self.voices = []
+        self.played = 0
+        self.merged = 0
+        self.stolen = 0
+        self.missing = 0
+
+        self.running = False
+        self.thread = None
+        if start:
+            self.start()
+
+    def load(self, filename):
+        # Samples from the asset bundle if it has them at this rate,
+        # otherwise from the WAV file
+        if self.bundle is not None and self.bundle.has_sound(filename, self.rate):
+            return self.bundle.sound(filename)
+        return decode_wav(filename, self.rate)
+
+    def play(self, filename):
+        # Never blocks: the mixing thread picks the request up
+        self.requests.append(filename)
+
+    def start_voice(self, filename):
+        if filename not in self.sounds:
+            self.sounds[filename] = self.load(filename)
+        sound = self.sounds[filename]
+        if sound is None:
+            self.missing += 1
+            return
+
+        # The same sound started twice in one block would only be louder
+        for voice in self.voices:
+            if voice[0] is sound and voice[1] == 0:
+                self.merged += 1
+                return
+
+        # Steal the voice that has been playing longest (by index: remove()
+        # would compare the sample arrays)
+        if len(self.voices) >= self.max_voices:
+            oldest = max(range(len(self.voices)), key=lambda i: self.voices[i][1])
+            del self.voices[oldest]
+            self.stolen += 1
+        self.voices.append([sound, 0])
+        self.played += 1
+
+    def mix(self, frames):
+        # The next block of frames as 16 bit stereo
+        while self.requests:
+            self.start_voice(self.requests.popleft())
+
+        block = np.zeros((frames, 2), dtype=np.float32)
+        for voice in self.voices:
+            sound, position = voice
+            chunk = sound[position:position + frames]
+            block[:len(chunk)] += chunk
+            voice[1] = position + frames
+        self.voices = [voice for voice in self.voices if voice[1] < len(voice[0])]
+        block *= self.volume
+        np.clip(block, -1.0, 1.0, out=block)
+        return (block * 32767).astype("<i2").tobytes()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        next_time = time.perf_counter()
+        while self.running:
+            self.sink.write(self.mix(self.block_size))
+            if not self.sink.blocking:
+                next_time += self.block_size / self.rate
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        self.sink.close()
+
+    def stats(self):
+        return "played {}, merged {}, stolen {}, missing {}, voices {}".format(
+            self.played, self.merged, self.stolen, self.missing, len(self.voices))
+
+
+def default_audio(wav_filename=None, bundle=None):
+    if wav_filename is not None:
+        return Mixer(WavSink(wav_filename, 44100), bundle=bundle)
+    if sounddevice is not None:
+        try:
+            return Mixer(DeviceSink(44100), bundle=bundle)
+        except sounddevice.PortAudioError:
+            pass
+    if winsound is not None:
+        return WinsoundAudio()
+    return NullAudio()
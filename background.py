@@ -0,0 +1,134 @@
+# Space Arena background
+# The background is cut into square tiles kept on the Tk canvas between
+# frames (the game pen's clear() doesn't touch them). Each frame the whole
+# layer is shifted with one canvas move, and tiles are only created or
+# deleted when the view crosses a tile edge, so the cost depends on the
+# window size, not the arena size. A layer with parallax < 1 scrolls more
+# slowly than the arena, which makes it look further away.
+import math
+import random
+import tkinter
+
+
+class TileLayer:
+    def __init__(self, canvas, tag, tile_size, view_width, view_height, parallax=1.0, above=None):
+        self.canvas = canvas
+        self.tag = tag
+        self.tile_size = tile_size
+        self.view_width = view_width
+        self.view_height = view_height
+        self.parallax = parallax
+
+        # Layer this one is stacked directly on top of (None for the bottom);
+        # update the layers bottom first
+        self.above = above
+
+        # Canvas items of each visible tile, keyed by (col, row)
+        self.items = {}
+        self.position = None
+        self.created = 0
+        self.deleted = 0
+
+    def has_tile(self, col, row):
+        return True
+
+    def create_tile(self, col, row, left, top):
+        # Canvas items for the tile with its top left corner at (left, top)
+        raise NotImplementedError
+
+    def update(self, camera_x, camera_y):
+        x = camera_x * self.parallax
+        y = camera_y * self.parallax
+
+        # Slide the tiles already on the canvas (canvas y points down)
+        if self.position is not None and self.position != (x, y):
+            self.canvas.move(self.tag, self.position[0] - x, y - self.position[1])
+        self.position = (x, y)
+
+        size = self.tile_size
+        min_col = math.floor((x - self.view_width / 2) / size)
+        max_col = math.floor((x + self.view_width / 2) / size)
+        min_row = math.floor((y - self.view_height / 2) / size)
+        max_row = math.floor((y + self.view_height / 2) / size)
+
+        for key in list(self.items):
+            col, row = key
+            if col < min_col or col > max_col or row < min_row or row > max_row:
+                self.canvas.delete(*self.items.pop(key))
+                self.deleted += 1
+
+        added = False
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                if (col, row) not in self.items and self.has_tile(col, row):
+                    self.items[(col, row)] = self.create_tile(col, row, col * size - x, y - (row + 1) * size)
+                    self.created += 1
+                    added = True
+
+        # New items go on top of the canvas; put the layer back underneath
+        # everything else (lowering the bottom layer never hides the others)
+        if added:
+            if self.above is not None and self.above.items:
+                self.canvas.tag_raise(self.tag, self.above.tag)
+            else:
+                self.canvas.tag_lower(self.tag)
+
+    def stats(self):
+        return "visible {}, created {}, deleted {}".format(len(self.items), self.created, self.deleted)
+
+
+class ImageTiles(TileLayer):
+    # An image centred on the arena's origin, cut into tiles the first time
+    # each one is needed
+    def __init__(self, canvas, image, tag="background", tile_size=250, view_width=1200, view_height=800,
+                 parallax=1.0, above=None):
+        TileLayer.__init__(self, canvas, tag, tile_size, view_width, view_height, parallax, above)
+        self.image = image
+        self.width = image.width()
+        self.height = image.height()
+        self.tiles = {}
+
+    def source_box(self, col, row):
+        # Part of the image the tile covers, clipped to the image
+        size = self.tile_size
+        left = col * size + self.width // 2
+        top = self.height // 2 - (row + 1) * size
+        return max(left, 0), max(top, 0), min(left + size, self.width), min(top + size, self.height), left, top
+
+    def has_tile(self, col, row):
+        x1, y1, x2, y2, left, top = self.source_box(col, row)
+        return x1 < x2 and y1 < y2
+
+    def create_tile(self, col, row, left, top):
+        tile = self.tiles.get((col, row))
+        if tile is None:
+            x1, y1, x2, y2, image_left, image_top = self.source_box(col, row)
+            tile = tkinter.PhotoImage(master=self.canvas, width=self.tile_size, height=self.tile_size)
+            tile.tk.call(tile, "copy", self.image, "-from", x1, y1, x2, y2,
+                         "-to", x1 - image_left, y1 - image_top)
+            self.tiles[(col, row)] = tile
+        return (self.canvas.create_image(left, top, image=tile, anchor="nw", tags=self.tag),)
+
+
+class StarTiles(TileLayer):
+    # Stars scattered over an endless plane; each tile's stars come from its
+    # own seed, so a tile looks the same every time it comes back into view
+    colors = ("white", "#c0c0c0", "#808080")
+
+    def __init__(self, canvas, tag="stars", tile_size=200, view_width=1200, view_height=800,
+                 parallax=0.5, above=None, stars_per_tile=12, seed=0):
+        TileLayer.__init__(self, canvas, tag, tile_size, view_width, view_height, parallax, above)
+        self.stars_per_tile = stars_per_tile
+        self.seed = seed
+
+    def create_tile(self, col, row, left, top):
+        rng = random.Random((col * 73856093) ^ (row * 19349663) ^ self.seed)
+        items = []
+        for _ in range(self.stars_per_tile):
+            x = left + rng.random() * self.tile_size
+            y = top + rng.random() * self.tile_size
+            size = rng.choice((1, 1, 2))
+            color = rng.choice(StarTiles.colors)
+            items.append(self.canvas.create_rectangle(x, y, x + size, y + size, fill=color, width=0,
+                                                      tags=self.tag))
+        return items
@@ -0,0 +1,448 @@
+# Space Arena batch runner
+# Plays many headless games at once, one per worker process (one worker per
+# core by default), for balance sweeps. Every combination of the grid's
+# parameter values is played by each player script with each seed, until
+# game over or the tick limit. Per-run results and a summary per
+# combination go to one JSON file.
+#
+#   python batch.py sweep.json                       run a grid spec
+#   python batch.py --param game_speed=0.3,0.4 --param Missile.max_fuel=150,200
+#   python batch.py --list                           list the player scripts
+#
+# A grid spec is a JSON object; every key is optional:
+#
+#   {"ticks": 20000, "seeds": [1, 2, 3], "players": ["bot"], "lives": 3,
+#    "level": 1, "size": 2000,
+#    "grid": {"game_speed": [0.3, 0.4],
+#             "Bomb.max_fuse": [30, 50],
+#             "Powerup.max_bombs": [1, 2],
+#             "enemy_mix": [{"hunter": 1, "mine": 1, "surveillance": 1},
+#                           {"hunter": 2, "mine": 1}]}}
+#
+# Parameters are game_speed, enemy_mix (relative weights of each enemy
+# type, or "hunter:2/mine:1" on the command line) and any number-valued
+# class attribute in arena as Class.attribute. A worker that dies (a crash,
+# or running past --timeout) is replaced, and its run retried up to
+# --retries times before it is recorded as crashed.
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import itertools
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+import numpy as np
+import arena
+from arena import *
+from renderer import NullPen
+from profiler import Profiler
+from benchmark import patrol
+
+
+def bot(game, tick):
+    # Turn toward the nearest enemy and shoot when lined up, bomb crowds,
+    # and go for the nearest powerup once every enemy is gone
+    player = game.player
+    if player.state != ACTIVE:
+        return
+    swarm = game.swarm
+    live = np.flatnonzero(swarm.state[:swarm.count] == ACTIVE)
+    if len(live):
+        gap = np.abs(swarm.x[live] - player.x) + np.abs(swarm.y[live] - player.y)
+        target = swarm.enemies[live[np.argmin(gap)]]
+    elif len(game.world.powerups):
+        target = min(game.world.powerups, key=lambda sprite: abs(sprite.x - player.x) + abs(sprite.y - player.y))
+    else:
+        player.stop_rotation()
+        player.decelerate()
+        return
+    distance = math.hypot(target.x - player.x, target.y - player.y)
+    angle = math.degrees(math.atan2(target.y - player.y, target.x - player.x))
+    turn = (angle - player.heading + 180) % 360 - 180
+    if turn > 5:
+        player.rotate_left()
+    elif turn < -5:
+        player.rotate_right()
+    else:
+        player.stop_rotation()
+
+    if abs(turn) < 30 and distance > 200:
+        if player.thrust == 0:
+            player.accelerate()
+    else:
+        player.decelerate()
+
+    if len(live):
+        if abs(turn) < 10 and distance < 250:
+            player.fire()
+        if len(game.grid.query_range(player.x, player.y, 100)) >= 3:
+            player.drop_bomb()
+
+
+def idle(game, tick):
+    pass
+
+
+PLAYERS = {"bot": bot, "patrol": patrol, "idle": idle}
+
+
+def parse_mix(value):
+    # "hunter:2/mine:1" as {"hunter": 2, "mine": 1}
+    mix = {}
+    for part in value.split("/"):
+        name, _, weight = part.partition(":")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def enemy_types(mix):
+    # Game.enemy_types for relative weights like {"hunter": 2, "mine": 1}
+    if isinstance(mix, str):
+        mix = parse_mix(mix)
+    types = []
+    for name, weight in mix.items():
+        if name not in ("hunter", "mine", "surveillance"):
+            raise ValueError("unknown enemy type {}".format(name))
+        types += [name] * weight
+    if not types:
+        raise ValueError("enemy mix {} has no enemies".format(mix))
+    return types
+
+
+def class_attribute(name):
+    # The arena class and attribute a name like "Missile.max_fuel" refers to
+    class_name, _, attribute = name.partition(".")
+    cls = getattr(arena, class_name, None)
+    if not isinstance(cls, type) or not attribute or \
+            not isinstance(getattr(cls, attribute, None), (int, float)):
+        raise ValueError("unknown parameter {}".format(name))
+    return cls, attribute
+
+
+def check_setting(name, value):
+    if name == "game_speed":
+        float(value)
+    elif name == "enemy_mix":
+        enemy_types(value)
+    else:
+        class_attribute(name)
+
+
+def apply_settings(settings):
+    # Set the module and class level parameters, returning what they were
+    # so restore_settings can put them back (enemy_mix is set on the game).
+    # game_speed goes first, since it resets the speed limits and
+    # acceleration the other settings may override.
+    saved = {}
+    attributes = [name for name in settings if name not in ("game_speed", "enemy_mix")]
+    for name in attributes:
+        cls, attribute = class_attribute(name)
+        saved[name] = getattr(cls, attribute)
+    if "game_speed" in settings:
+        saved["game_speed"] = arena.game_speed
+        set_game_speed(settings["game_speed"])
+    for name in attributes:
+        cls, attribute = class_attribute(name)
+        setattr(cls, attribute, settings[name])
+    return saved
+
+
+def restore_settings(saved):
+    apply_settings(saved)
+
+
+def play(task):
+    # One headless game, with the profiler timing every tick
+    settings = task["settings"]
+    saved = apply_settings(settings)
+    try:
+        game = Game(task["size"], task["size"], seed=task["seed"])
+        if "enemy_mix" in settings:
+            game.enemy_types = enemy_types(settings["enemy_mix"])
+        game.level = task["level"]
+        profiler = Profiler(window=task["ticks"])
+        game.profiler = profiler
+        game.start_level()
+        game.start()
+        game.player.lives = task["lives"]
+        script = PLAYERS[task["player"]]
+        camera = Camera(game.player.x + CAMERA_OFFSET, game.player.y)
+        pen = NullPen()
+
+        start = time.perf_counter()
+        tick = 0
+        while tick < task["ticks"] and game.state == "playing":
+            profiler.begin_frame()
+            script(game, tick)
+            game.update()
+            camera.update(game.player.x + CAMERA_OFFSET, game.player.y)
+            game.render(pen, camera)
+            profiler.end_frame()
+            tick += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        restore_settings(saved)
+
+    frame = profiler.summary().get("frame", {"mean": 0.0, "p99": 0.0, "max": 0.0})
+    return {"ticks": tick,
+            "survival_seconds": tick / TICK_RATE,
+            "game_over": game.state == "game over",
+            "level": game.level,
+            "kills": game.kills,
+            "score": game.player.score,
+            "seconds": elapsed,
+            "frame_mean_ms": frame["mean"],
+            "frame_p99_ms": frame["p99"],
+            "frame_max_ms": frame["max"]}
+
+
+def work(connection):
+    # Worker process: play each task sent down the pipe and send back the
+    # result, until sent None
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        try:
+            result = play(task)
+        except Exception:
+            result = {"error": traceback.format_exc()}
+        connection.send(result)
+
+
+class Worker:
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=work, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.task = None
+        self.started = None
+
+    def send(self, task):
+        self.task = task
+        self.started = time.perf_counter()
+        self.connection.send(task)
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+def make_tasks(spec):
+    grid = spec.get("grid", {})
+    names = sorted(grid)
+    for name in names:
+        for value in grid[name]:
+            check_setting(name, value)
+    for player in spec.get("players", ["bot"]):
+        if player not in PLAYERS:
+            raise ValueError("unknown player {}".format(player))
+
+    tasks = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        settings = dict(zip(names, values))
+        for player in spec.get("players", ["bot"]):
+            for seed in spec.get("seeds", [1, 2, 3, 4]):
+                tasks.append({"id": len(tasks),
+                              "settings": settings,
+                              "player": player,
+                              "seed": seed,
+                              "ticks": spec.get("ticks", 20000),
+                              "lives": spec.get("lives", 3),
+                              "level": spec.get("level", 1),
+                              "size": spec.get("size", 2000)})
+    return tasks
+
+
+def run_batch(tasks, workers, retries=2, timeout=None, progress=None):
+    # Results in task order. A task whose worker died is retried on a
+    # fresh worker up to retries times, then recorded as crashed.
+    context = multiprocessing.get_context()
+    pending = list(reversed(tasks))
+    attempts = {}
+    results = {}
+    pool = [Worker(context) for _ in range(min(workers, len(tasks)))]
+    try:
+        while len(results) < len(tasks):
+            for worker in pool:
+                if worker.task is None and pending:
+                    task = pending.pop()
+                    attempts[task["id"]] = attempts.get(task["id"], 0) + 1
+                    worker.send(task)
+            busy = [worker for worker in pool if worker.task is not None]
+            ready = wait([worker.connection for worker in busy] + [worker.process.sentinel for worker in busy],
+                         timeout)
+
+            for i, worker in enumerate(pool):
+                if worker.task is None:
+                    continue
+                task = worker.task
+                result = None
+                if worker.connection in ready or worker.process.sentinel in ready:
+                    try:
+                        if worker.connection.poll():
+                            result = worker.connection.recv()
+                    except (EOFError, OSError):
+                        pass
+                    if result is None and worker.process.is_alive():
+                        continue
+                elif timeout is None or time.perf_counter() - worker.started < timeout:
+                    continue
+
+                if result is None:
+                    # Crashed or hung: replace the worker and retry the task
+                    worker.kill()
+                    pool[i] = Worker(context)
+                    if attempts[task["id"]] <= retries:
+                        pending.append(task)
+                        continue
+                    result = {"error": "worker died {} times (exit code {})".format(
+                        attempts[task["id"]], worker.process.exitcode), "crashed": True}
+                else:
+                    worker.task = None
+                result.update({"id": task["id"], "settings": task["settings"], "player": task["player"],
+                               "seed": task["seed"], "attempts": attempts[task["id"]]})
+                results[task["id"]] = result
+                if progress is not None:
+                    progress(len(results), len(tasks), result)
+    finally:
+        for worker in pool:
+            worker.stop()
+        for worker in pool:
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.kill()
+    return [results[task["id"]] for task in tasks]
+
+
+def mean(values):
+    if not values:
+        return None
+    return sum(values) / len(values)
+
+
+def summarize(results):
+    # Averages over the seeds of each settings and player combination
+    groups = {}
+    for result in results:
+        key = json.dumps([result["settings"], result["player"]], sort_keys=True)
+        groups.setdefault(key, []).append(result)
+
+    summary = []
+    for runs in groups.values():
+        good = [run for run in runs if "error" not in run]
+        summary.append({"settings": runs[0]["settings"],
+                        "player": runs[0]["player"],
+                        "runs": len(runs),
+                        "failed": len(runs) - len(good),
+                        "game_overs": sum(run["game_over"] for run in good),
+                        "level": mean([run["level"] for run in good]),
+                        "max_level": max([run["level"] for run in good], default=None),
+                        "survival_seconds": mean([run["survival_seconds"] for run in good]),
+                        "kills": mean([run["kills"] for run in good]),
+                        "score": mean([run["score"] for run in good]),
+                        "frame_mean_ms": mean([run["frame_mean_ms"] for run in good]),
+                        "frame_p99_ms": max([run["frame_p99_ms"] for run in good], default=None)})
+    return summary
+
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def print_summary(summary):
+    print()
+    print("{:>6}{:>8}{:>9}{:>9}{:>9}{:>10}  {}".format(
+        "level", "kills", "survived", "frame", "p99", "failed", "settings"))
+    for row in summary:
+        if row["level"] is None:
+            print("{:>51}  {} {}".format(row["failed"], row["player"], json.dumps(row["settings"])))
+            continue
+        print("{:6.1f}{:8.1f}{:8.0f}s{:7.3f}ms{:7.3f}ms{:>10}  {} {}".format(
+            row["level"], row["kills"], row["survival_seconds"], row["frame_mean_ms"], row["frame_p99_ms"],
+            row["failed"], row["player"], json.dumps(row["settings"])))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Play headless Space Arena games in parallel for balance sweeps.")
+    parser.add_argument("spec", nargs="?", help="JSON grid spec")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2",
+                        help="sweep a parameter over these values (added to the spec's grid)")
+    parser.add_argument("--seeds", type=int, help="play seeds 1 to SEEDS")
+    parser.add_argument("--ticks", type=int, help="tick limit per game")
+    parser.add_argument("--player", action="append", help="player script (default: bot)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--retries", type=int, default=2, help="times to retry a run whose worker died")
+    parser.add_argument("--timeout", type=float, help="seconds before a run counts as hung")
+    parser.add_argument("--output", default="batch.json")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in PLAYERS:
+            print(name)
+        return 0
+
+    spec = {}
+    if args.spec is not None:
+        spec_file = open(args.spec)
+        spec = json.load(spec_file)
+        spec_file.close()
+    grid = spec.setdefault("grid", {})
+    for param in args.param:
+        name, _, values = param.partition("=")
+        if name == "enemy_mix":
+            grid[name] = values.split(",")
+        else:
+            grid[name] = [parse_value(value) for value in values.split(",")]
+    if args.seeds is not None:
+        spec["seeds"] = list(range(1, args.seeds + 1))
+    if args.ticks is not None:
+        spec["ticks"] = args.ticks
+    if args.player:
+        spec["players"] = args.player
+    try:
+        tasks = make_tasks(spec)
+    except ValueError as error:
+        parser.error(str(error))
+
+    def progress(done, total, result):
+        status = "ok"
+        if "error" in result:
+            status = result["error"].strip().splitlines()[-1]
+        print("[{}/{}] {} seed {} {}: {}".format(done, total, result["player"], result["seed"],
+                                                 json.dumps(result["settings"]), status))
+
+    print("{} runs on {} workers".format(len(tasks), min(args.workers, len(tasks))))
+    start = time.perf_counter()
+    results = run_batch(tasks, args.workers, args.retries, args.timeout, progress)
+    elapsed = time.perf_counter() - start
+    summary = summarize(results)
+    print_summary(summary)
+    print("{} runs in {:.1f} s".format(len(results), elapsed))
+
+    output_file = open(args.output, "w")
+    json.dump({"spec": spec, "workers": args.workers, "seconds": elapsed,
+               "summary": summary, "runs": results}, output_file, indent=2)
+    output_file.close()
+    if any("error" in result for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
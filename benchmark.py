@@ -0,0 +1,248 @@
+# Space Arena benchmarks
+# Runs named scenarios headless: a seeded game, a scripted player and a
+# fixed number of ticks, each one updated and rendered through NullPen with
+# the profiler on. Results go to a JSON file and can be compared against a
+# stored baseline.
+#
+#   python benchmark.py                          run every scenario
+#   python benchmark.py level-8 bomb-storm       run some of them
+#   python benchmark.py --save-baseline          store the results as the baseline
+#   python benchmark.py --list                   list the scenarios
+#   python benchmark.py --replay FILE            play a main.py --record file headless at full speed
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+from arena import *
+from renderer import NullPen
+from profiler import Profiler
+from controls import Replay, load_recording
+
+
+class Scenario:
+    def __init__(self, name, level, script, setup=None, size=2000):
+        self.name = name
+        self.level = level
+        self.script = script
+        self.setup = setup
+        self.size = size
+
+
+def patrol(game, tick):
+    # Circle around the arena, firing now and then
+    player = game.player
+    if tick % 7 == 0:
+        player.rotate_left()
+    if tick % 11 == 0:
+        player.stop_rotation()
+    if tick % 13 == 0:
+        player.accelerate()
+    if tick % 17 == 0:
+        player.decelerate()
+    if tick % 9 == 0:
+        player.fire()
+
+
+def bomb_storm(game, tick):
+    # A bomb whenever the last one has gone off
+    patrol(game, tick)
+    game.player.bombs = 1
+    game.player.drop_bomb()
+
+
+def multishot_spam(game, tick):
+    # Fire every tick with multishot topped up
+    patrol(game, tick)
+    game.player.multishot = 50
+    game.player.fire()
+
+
+def crowded(game):
+    game.spawner.max_active = 4096
+
+
+def crowded_respawn(game, tick):
+    # Die as soon as the last respawn has finished
+    patrol(game, tick)
+    if game.player.state == ACTIVE:
+        game.player.health = 0
+
+
+SCENARIOS = {}
+for level in range(1, 17):
+    SCENARIOS["level-{}".format(level)] = Scenario("level-{}".format(level), level, patrol)
+SCENARIOS["bomb-storm"] = Scenario("bomb-storm", 8, bomb_storm)
+SCENARIOS["multishot-spam"] = Scenario("multishot-spam", 8, multishot_spam)
+SCENARIOS["crowded-respawn"] = Scenario("crowded-respawn", 12, crowded_respawn, crowded)
+SCENARIOS["big-arena"] = Scenario("big-arena", 12, patrol, crowded, 6000)
+
+
+def run(scenario, ticks, seed, memory=False):
+    game = Game(scenario.size, scenario.size, seed=seed)
+    game.level = scenario.level
+    profiler = Profiler(window=ticks)
+    game.profiler = profiler
+    game.start_level()
+    game.start()
+    game.player.lives = 1000000
+    if scenario.setup is not None:
+        scenario.setup(game)
+    camera = Camera(game.player.x + CAMERA_OFFSET, game.player.y)
+    pen = NullPen()
+
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    tick = 0
+    while tick < ticks and game.state == "playing":
+        profiler.begin_frame()
+        scenario.script(game, tick)
+        game.update()
+        camera.update(game.player.x + CAMERA_OFFSET, game.player.y)
+        game.render(pen, camera)
+        profiler.end_frame()
+        tick += 1
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    return {"ticks": tick,
+            "seconds": elapsed,
+            "ticks_per_second": tick / elapsed,
+            "phases": profiler.summary(),
+            "peak_memory_kb": peak,
+            "level": game.level,
+            "score": game.player.score,
+            "enemies": game.enemy_count}
+
+
+def replay(filename):
+    # Play a recording back with no window, sound or clock, as fast as the
+    # ticks run, up to the tick it was saved on (or its last command)
+    seed, commands, ticks = load_recording(filename)
+    game = Game(2000, 2000, seed=seed)
+    game.start_level()
+    game.start()
+    player = Replay(game, commands)
+
+    start = time.perf_counter()
+    while game.state == "playing":
+        if ticks is None:
+            if player.finished():
+                break
+        elif game.tick >= ticks:
+            break
+        player.apply()
+        game.update()
+    elapsed = time.perf_counter() - start
+    return {"ticks": game.tick,
+            "seconds": elapsed,
+            "ticks_per_second": game.tick / elapsed if elapsed else 0.0,
+            "state": game.state,
+            "level": game.level,
+            "score": game.player.score,
+            "lives": game.player.lives,
+            "commands": player.index}
+
+
+def compare(results, baseline, tolerance):
+    # Print the change in ticks per second; True if anything got slower
+    # by more than tolerance
+    regressed = False
+    print()
+    print("{:18}{:>12}{:>12}{:>9}".format("Scenario", "ticks/s", "baseline", "change"))
+    for name, result in results["scenarios"].items():
+        if name not in baseline["scenarios"]:
+            continue
+        now = result["ticks_per_second"]
+        before = baseline["scenarios"][name]["ticks_per_second"]
+        change = now / before - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  slower"
+            regressed = True
+        print("{:18}{:12.0f}{:12.0f}{:8.1f}%{}".format(name, now, before, change * 100, flag))
+    return regressed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run headless Space Arena benchmarks.")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run (default: all)")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file too")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="slowdown allowed before flagging")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recording headless and print where it ended")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        result = replay(args.replay)
+        print("Replayed {} commands over {} ticks in {:.2f} s ({:.0f} ticks/s)".format(
+            result["commands"], result["ticks"], result["seconds"], result["ticks_per_second"]))
+        print("Ended {}: level {}, score {}, lives {}".format(
+            result["state"], result["level"], result["score"], result["lives"]))
+        return 0
+
+    if args.list:
+        for name in SCENARIOS:
+            print(name)
+        return 0
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario {}".format(name))
+
+    results = {"python": platform.python_version(),
+               "numpy": np.__version__,
+               "machine": platform.machine(),
+               "ticks": args.ticks,
+               "seed": args.seed,
+               "scenarios": {}}
+    print("{:18}{:>8}{:>12}{:>12}{:>12}".format("Scenario", "ticks", "ticks/s", "p99 (ms)", "peak (KB)"))
+    for name in names:
+        result = run(SCENARIOS[name], args.ticks, args.seed)
+
+        # Memory tracing slows everything down, so peak memory comes from
+        # a second run of the same seeded ticks
+        if not args.no_memory:
+            result["peak_memory_kb"] = run(SCENARIOS[name], args.ticks, args.seed, True)["peak_memory_kb"]
+        results["scenarios"][name] = result
+        peak = "-"
+        if result["peak_memory_kb"] is not None:
+            peak = "{:.0f}".format(result["peak_memory_kb"])
+        print("{:18}{:8}{:12.0f}{:12.3f}{:>12}".format(
+            name, result["ticks"], result["ticks_per_second"], result["phases"]["frame"]["p99"], peak))
+
+    output_file = open(args.output, "w")
+    json.dump(results, output_file, indent=2)
+    output_file.close()
+
+    if args.save_baseline:
+        baseline_file = open(args.baseline, "w")
+        json.dump(results, baseline_file, indent=2)
+        baseline_file.close()
+        return 0
+
+    try:
+        baseline_file = open(args.baseline)
+    except FileNotFoundError:
+        return 0
+    baseline = json.load(baseline_file)
+    baseline_file.close()
+    if compare(results, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,144 @@
+# Space Arena network client
+# A thin renderer for a game running on server.py. Key presses are sent to
+# the server as commands, and each frame draws whatever the latest snapshot
+# holds, through the sprites' own render code (see netcode.Mirror).
+#
+#   python client.py                          join the "default" arena on this machine
+#   python client.py --arena duel --watch     watch the game in the "duel" arena
+import sys
+import json
+import socket
+import argparse
+from turtlewriter import *
+from arena import *
+from assets import load_bundle
+from background import ImageTiles
+from clock import FixedStepClock
+from hud import Hud
+from renderer import CanvasLayer
+from main import open_window, new_hud_pen
+import netcode
+
+
+class ServerConnection:
+    def __init__(self, host, port):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setblocking(False)
+        self.buffer = netcode.MessageBuffer()
+        self.commands = []
+        self.closed = False
+
+    def send(self, value):
+        self.socket.sendall(netcode.json_message(value))
+
+    def command(self, name):
+        # Callback queueing the command, for binding to a key
+        def press():
+            self.commands.append(name)
+
+        return press
+
+    def flush(self):
+        # Send the commands queued since the last frame
+        if self.commands:
+            self.send({"commands": self.commands})
+            self.commands = []
+
+    def receive(self):
+        # Messages that have arrived since the last call
+        while not self.closed:
+            try:
+                data = self.socket.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                self.closed = True
+            self.buffer.feed(data)
+        return list(self.buffer.messages())
+
+
+def bind_keys(wn, connection):
+    wn.listen()
+    wn.onkeypress(connection.command("rotate_left"), "Left")
+    wn.onkeypress(connection.command("rotate_right"), "Right")
+
+    wn.onkeyrelease(connection.command("stop_rotation"), "Left")
+    wn.onkeyrelease(connection.command("stop_rotation"), "Right")
+
+    wn.onkeypress(connection.command("accelerate"), "Up")
+    wn.onkeyrelease(connection.command("decelerate"), "Up")
+
+    wn.onkeypress(connection.command("fire"), "space")
+    wn.onkeypress(connection.command("drop_bomb"), "Down")
+
+    def new_game():
+        connection.send({"new_game": True})
+
+    wn.onkeypress(new_game, "n")
+    wn.onkeypress(new_game, "N")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Space Arena on a server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5230)
+    parser.add_argument("--arena", default="default")
+    parser.add_argument("--watch", action="store_true", help="watch without flying")
+    args = parser.parse_args(argv)
+
+    connection = ServerConnection(args.host, args.port)
+    connection.send({"join": args.arena, "watch": args.watch})
+
+    bundle = load_bundle()
+    wn, pen = open_window(bundle)
+    wn.title("Space Arena! {}".format(args.arena))
+    mirror = netcode.Mirror()
+    character_pen = CharacterPen("red", 3.0)
+    hud = Hud(mirror, character_pen, new_hud_pen, CanvasLayer(wn.getcanvas(), "hud"))
+    background = ImageTiles(wn.getcanvas(), pen.shapes.image("background.gif"),
+                            view_width=SCREEN_WIDTH + INFO_WIDTH, view_height=SCREEN_HEIGHT)
+    camera = Camera(CAMERA_OFFSET, 0)
+    clock = FixedStepClock(render_rate=60)
+    controlling = False
+    if not args.watch:
+        bind_keys(wn, connection)
+
+    while not connection.closed:
+        for kind, body in connection.receive():
+            if kind == netcode.SNAPSHOT:
+                mirror.apply(body)
+            else:
+                welcome = json.loads(body)
+                mirror.width = welcome["width"]
+                mirror.height = welcome["height"]
+                controlling = welcome["controlling"]
+        connection.flush()
+
+        x, y = mirror.player_position()
+        camera.update(x + CAMERA_OFFSET, y)
+
+        pen.begin_frame()
+        pen.clear()
+        background.update(camera.x, camera.y)
+        pen.begin_batch()
+        mirror.render(pen, camera)
+        pen.end_batch()
+        hud.render()
+        if mirror.state == "game over":
+            character_pen.scale = 3.0
+            character_pen.draw_string(pen, "GAME OVER", 0, 0)
+            if controlling:
+                character_pen.scale = 1.0
+                character_pen.draw_string(pen, "PRESS N FOR A NEW GAME", 0, -80)
+        pen.end_frame()
+
+        clock.wait()
+        wn.update()
+
+    print("Disconnected from {}:{}".format(args.host, args.port))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,87 @@
+# Space Arena fixed timestep clock
+# The simulation always advances in ticks of 1 / TICK_RATE seconds, however
+# long frames take to draw. Real time is banked in an accumulator and spent
+# one tick at a time: a slow frame runs several ticks (at most max_steps,
+# the rest of the backlog is dropped) and a fast frame may run none. Frames
+# are paced separately at render_rate and drawn alpha of the way between
+# the last two ticks.
+import time
+from arena import TICK_RATE
+
+
+class FixedStepClock:
+    NUM_FRAME_TIMES = 500
+
+    def __init__(self, render_rate=60, max_steps=5):
+        self.tick_time = 1.0 / TICK_RATE
+        self.render_rate = render_rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.last_time = None
+        self.ticks = 0
+        self.dropped_ticks = 0
+
+        # Time spent on each frame before sleeping, over the last NUM_FRAME_TIMES frames
+        self.frame_time_index = 0
+        self.total_frame_times = 0
+        self.frame_times = []
+        for i in range(FixedStepClock.NUM_FRAME_TIMES):
+            self.frame_times.append(0.0)
+        self.max_frame_time = 0
+        self.last_frame_time = None
+
+    def reset(self):
+        # Forget time that passed while the game wasn't running
+        self.accumulator = 0.0
+        self.last_time = None
+        self.last_frame_time = None
+
+    def advance(self):
+        # Number of ticks to run before drawing this frame
+        now = time.perf_counter()
+        if self.last_time is None:
+            self.accumulator = self.tick_time
+        else:
+            self.accumulator += now - self.last_time
+        self.last_time = now
+
+        steps = int(self.accumulator / self.tick_time)
+        if steps > self.max_steps:
+            self.dropped_ticks += steps - self.max_steps
+            self.accumulator -= (steps - self.max_steps) * self.tick_time
+            steps = self.max_steps
+        self.accumulator -= steps * self.tick_time
+        self.ticks += steps
+        return steps
+
+    def alpha(self):
+        # How far this frame is from the last tick to the next one, 0 to 1
+        return min(self.accumulator / self.tick_time, 1.0)
+
+    def wait(self):
+        # Sleep out the rest of the frame, if rendering is rate limited
+        t = time.perf_counter()
+        if self.last_frame_time is not None:
+            actual = t - self.last_frame_time
+            if actual > self.max_frame_time:
+                self.max_frame_time = actual
+            self.total_frame_times -= self.frame_times[self.frame_time_index]
+            self.total_frame_times += actual
+            self.frame_times[self.frame_time_index] = actual
+            self.frame_time_index += 1
+            self.frame_time_index %= FixedStepClock.NUM_FRAME_TIMES
+            if self.render_rate is not None:
+                delay = 1.0 / self.render_rate - actual
+                if delay < 0.0001:
+                    delay = 0.0001
+                time.sleep(delay)
+        self.last_frame_time = time.perf_counter()
+
+    def print_stats(self):
+        avg_frame_time = self.total_frame_times / FixedStepClock.NUM_FRAME_TIMES
+        print("Tick Rate:          {}".format(TICK_RATE))
+        print("Render Rate:        {}".format(self.render_rate))
+        print("Average Frame Time: {}".format(avg_frame_time))
+        print("Max Frame Time:     {}".format(self.max_frame_time))
+        print("Ticks:              {}".format(self.ticks))
+        print("Dropped Ticks:      {}".format(self.dropped_ticks))
@@ -0,0 +1,25 @@
+# Space Arena batch collision
+# Builds bounding-box arrays for two groups of sprites and tests every pair
+# in one NumPy operation, giving a hit matrix with one row per attacker
+# and one column per target.
+import numpy as np
+
+
+def boxes(sprites):
+    # Centre x, centre y, half width and half height of each sprite
+    if not sprites:
+        return np.zeros((4, 0))
+    array = np.array([(sprite.x, sprite.y, sprite.width, sprite.height) for sprite in sprites],
+                     dtype=np.float64).T
+    array[2:] /= 2
+    return array
+
+
+def hit_matrix(attackers, targets):
+    # Same test as Sprite.is_collision, for every attacker/target pair. Like
+    # is_collision, the last comparison uses the target's half width, not
+    # its half height (every sprite is square, so the two agree).
+    ax, ay, ahw, ahh = attackers[:, :, np.newaxis]
+    tx, ty, thw, thh = targets[:, np.newaxis, :]
+    return (ax - ahw < tx + thw) & (ax + ahw > tx - thw) & \
+           (ay - ahh < ty + thh) & (ay + ahh > ty - thw)
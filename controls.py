@@ -0,0 +1,66 @@
+# Space Arena controls
+# Key presses are queued as player commands and only carried out at the
+# start of the next tick, so they always land on a tick boundary instead of
+# wherever the window's event loop happened to run them. Each command is
+# logged with the tick it was applied on; replaying the log into a game
+# with the same seed reproduces the run exactly.
+import json
+
+COMMANDS = ("rotate_left", "rotate_right", "stop_rotation", "accelerate", "decelerate", "fire", "drop_bomb")
+
+
+class Controls:
+    def __init__(self, game):
+        self.game = game
+        self.pending = []
+        self.log = []
+
+    def command(self, name):
+        # Callback queueing the command, for binding to a key
+        if name not in COMMANDS:
+            raise ValueError("unknown command {}".format(name))
+
+        def press():
+            self.pending.append(name)
+
+        return press
+
+    def apply(self):
+        # Carry out the queued commands; call just before Game.update
+        game = self.game
+        for name in self.pending:
+            getattr(game.player, name)()
+            self.log.append((game.tick, name))
+        self.pending.clear()
+
+    def save(self, filename):
+        recording_file = open(filename, "w")
+        json.dump({"seed": self.game.seed, "ticks": self.game.tick, "commands": self.log}, recording_file)
+        recording_file.close()
+
+
+class Replay:
+    # Commands from a saved log, carried out on the ticks they were recorded on
+    def __init__(self, game, commands):
+        self.game = game
+        self.commands = commands
+        self.index = 0
+
+    def apply(self):
+        game = self.game
+        commands = self.commands
+        while self.index < len(commands) and commands[self.index][0] <= game.tick:
+            getattr(game.player, commands[self.index][1])()
+            self.index += 1
+
+    def finished(self):
+        return self.index == len(self.commands)
+
+
+def load_recording(filename):
+    # Seed, (tick, command) list and number of ticks played (None in
+    # recordings from before that was saved) saved by Controls.save
+    recording_file = open(filename)
+    recording = json.load(recording_file)
+    recording_file.close()
+    return recording["seed"], [(tick, name) for tick, name in recording["commands"]], recording.get("ticks")
@@ -0,0 +1,119 @@
+# Space Arena heads-up display
+# The info panel lives on its own turtles so the per-frame pen.clear()
+# never touches it. The panel, separator and labels are drawn once; each
+# value has a turtle of its own and is only cleared and redrawn when the
+# text it shows changes.
+from arena import *
+
+
+class HudField:
+    def __init__(self, pen, x, y):
+        self.pen = pen
+        self.x = x
+        self.y = y
+        self.text = None
+
+
+class Hud:
+    def __init__(self, game, character_pen, new_pen, layer):
+        # new_pen() makes a fresh pen on a turtle of its own; layer keeps
+        # whatever the HUD draws above the rest of the frame
+        self.game = game
+        self.character_pen = character_pen
+        self.new_pen = new_pen
+        self.layer = layer
+        self.static_pen = None
+        self.fields = {}
+
+        # Cost counters
+        self.redraws = 0
+        self.frame_calls = 0
+        self.last_frame_calls = 0
+        self.max_frame_calls = 0
+        self.total_calls = 0
+
+    def add_field(self, name, y):
+        self.fields[name] = HudField(self.new_pen(), INFO_CENTER, y)
+
+    def draw_static(self):
+        pen = self.static_pen = self.new_pen()
+        self.layer.begin()
+        pen.begin_frame()
+
+        pen.color("#222255")
+        pen.penup()
+        pen.goto(INFO_CENTER, 0)
+        pen.shape("square")
+        pen.setheading(90)
+        pen.shapesize(10, SCREEN_HEIGHT / 20, None)
+        pen.stamp()
+
+        separator_x = INFO_CENTER - INFO_WIDTH / 2
+        pen.color("white")
+        pen.width(3)
+        pen.goto(separator_x, SCREEN_HEIGHT / 2)
+        pen.pendown()
+        pen.goto(separator_x, -SCREEN_HEIGHT / 2)
+        pen.penup()
+
+        self.character_pen.scale = 1.0
+        self.character_pen.draw_string(pen, "SPACE ARENA", INFO_CENTER, 370)
+        self.character_pen.draw_string(pen, "HIGH SCORE", INFO_CENTER, 290)
+        self.character_pen.draw_string(pen, "MULTISHOTS", INFO_CENTER, 100)
+
+        pen.end_frame()
+        self.frame_calls += pen.last_frame_calls
+        self.layer.end()
+
+        self.add_field("score", 330)
+        self.add_field("high score", 260)
+        self.add_field("enemies", 220)
+        self.add_field("lives", 180)
+        self.add_field("level", 140)
+        self.add_field("multishot", 70)
+        self.add_field("bombs", 30)
+
+    def values(self):
+        game = self.game
+        player = game.player
+        return (
+            ("score", "SCORE {}".format(player.score)),
+            ("high score", str(game.high_score)),
+            ("enemies", "ENEMIES {}".format(game.enemy_count)),
+            ("lives", "LIVES {}".format(player.lives)),
+            ("level", "LEVEL {}".format(game.level)),
+            ("multishot", str(player.multishot)),
+            ("bombs", "BOMBS {}".format(player.bombs)),
+        )
+
+    def render(self):
+        self.frame_calls = 0
+        if self.static_pen is None:
+            self.draw_static()
+
+        for name, text in self.values():
+            field = self.fields[name]
+            if text != field.text:
+                pen = field.pen
+                self.layer.begin()
+                pen.begin_frame()
+                pen.clear()
+                self.character_pen.scale = 1.0
+                self.character_pen.draw_string(pen, text, field.x, field.y)
+                pen.end_frame()
+                self.layer.end()
+                field.text = text
+                self.redraws += 1
+                self.frame_calls += pen.last_frame_calls
+
+        # Keep the panel above the sprites drawn this frame
+        self.layer.lift()
+
+        self.last_frame_calls = self.frame_calls
+        self.total_calls += self.frame_calls
+        if self.frame_calls > self.max_frame_calls:
+            self.max_frame_calls = self.frame_calls
+
+    def stats(self):
+        return "last frame {}, max frame {}, total {}, redraws {}".format(
+            self.last_frame_calls, self.max_frame_calls, self.total_calls, self.redraws)
@@ -0,0 +1,181 @@
+# Space Arena server load test
+# Starts a server (or uses one already running) and connects loopback
+# clients to it: in each arena one player pressing random keys and some
+# watchers. Every client rebuilds its arena with a Mirror, which checks
+# that each snapshot was diffed against the one it was sent before. At the
+# end the server's per-arena metrics are printed, along with what the
+# clients received.
+#
+#   python loadtest.py                            8 arenas, 1 watcher each, 10 seconds
+#   python loadtest.py --arenas 32 --watchers 3 --seconds 30
+#   python loadtest.py --connect 127.0.0.1:5230   test a server that is already running
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+import netcode
+from controls import COMMANDS
+from server import print_arena_stats
+
+
+class LoadClient:
+    def __init__(self, arena, watch, seed):
+        self.arena = arena
+        self.watch = watch
+        self.rng = random.Random(seed)
+        self.mirror = netcode.Mirror()
+        self.mirror.make_ghosts = False
+        self.snapshots = 0
+        self.full_snapshots = 0
+        self.bytes = 0
+        self.apply_time = 0.0
+        self.error = None
+
+    async def run(self, host, port, seconds):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(netcode.json_message({"join": self.arena, "watch": self.watch}))
+        if not self.watch:
+            asyncio.ensure_future(self.press_keys(writer, seconds))
+        end = time.perf_counter() + seconds
+        try:
+            while time.perf_counter() < end:
+                try:
+                    kind, body = await asyncio.wait_for(netcode.read_message(reader), end - time.perf_counter())
+                except asyncio.TimeoutError:
+                    break
+                self.bytes += len(body) + netcode.LENGTH.size + 1
+                if kind == netcode.SNAPSHOT:
+                    start = time.perf_counter()
+                    if netcode.HEADER.unpack_from(body)[1] == netcode.FULL:
+                        self.full_snapshots += 1
+                    self.mirror.apply(body)
+                    self.apply_time += time.perf_counter() - start
+                    self.snapshots += 1
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError) as error:
+            self.error = "{}: {}".format(type(error).__name__, error)
+        writer.close()
+
+    async def press_keys(self, writer, seconds):
+        # A few random commands ten times a second, starting over after
+        # game over
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end and not writer.is_closing():
+            if self.mirror.state == "game over":
+                writer.write(netcode.json_message({"new_game": True}))
+            else:
+                commands = [self.rng.choice(COMMANDS) for _ in range(self.rng.randint(1, 3))]
+                writer.write(netcode.json_message({"commands": commands}))
+            await asyncio.sleep(0.1)
+
+
+async def server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(netcode.json_message({"stats": True}))
+    while True:
+        kind, body = await netcode.read_message(reader)
+        if kind == netcode.JSON:
+            writer.close()
+            return json.loads(body)
+
+
+async def load_test(host, port, arenas, watchers, seconds):
+    clients = []
+    for i in range(arenas):
+        for j in range(watchers + 1):
+            clients.append(LoadClient("load-{}".format(i), j > 0, i * 100 + j))
+    start = time.perf_counter()
+    runs = [asyncio.ensure_future(client.run(host, port, seconds)) for client in clients]
+
+    # Ask for the metrics while every arena is still open
+    await asyncio.sleep(seconds * 0.95)
+    stats = await server_stats(host, port)
+    await asyncio.gather(*runs)
+    return clients, stats, time.perf_counter() - start
+
+
+def free_port():
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def start_server(port, size):
+    # A server process on port, once it is accepting connections
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+                               "--port", str(port), "--size", str(size)], stdout=subprocess.PIPE, text=True)
+    line = server.stdout.readline()
+    if not line.startswith("Listening"):
+        server.kill()
+        raise RuntimeError("server didn't start")
+    return server
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Load test the Space Arena server over loopback.")
+    parser.add_argument("--arenas", type=int, default=8)
+    parser.add_argument("--watchers", type=int, default=1, help="watching clients per arena")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--size", type=int, default=2000, help="arena size for the started server")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="use a running server instead of starting one")
+    parser.add_argument("--output", help="write the server and client metrics to this JSON file")
+    args = parser.parse_args(argv)
+    if not 0 < args.size <= netcode.MAX_ARENA_SIZE or args.size % 2:
+        parser.error("--size must be an even number up to {}".format(netcode.MAX_ARENA_SIZE))
+
+    server = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        port = int(port)
+    else:
+        host = "127.0.0.1"
+        port = free_port()
+        server = start_server(port, args.size)
+    try:
+        clients, stats, elapsed = asyncio.run(load_test(host, port, args.arenas, args.watchers, args.seconds))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    arenas = sorted(stats["arenas"], key=lambda arena: arena["arena"])
+    print_arena_stats(arenas)
+    snapshots = sum(client.snapshots for client in clients)
+    received = sum(client.bytes for client in clients)
+    ticks = sum(arena["ticks"] for arena in arenas)
+    dropped = sum(arena["dropped_ticks"] for arena in arenas)
+    print()
+    print("Clients:            {} in {} arenas for {:.1f} s".format(len(clients), args.arenas, elapsed))
+    print("Server:             {} ticks, {} dropped, {:.1f} KB/s out".format(
+        ticks, dropped, sum(arena["kb_per_second_out"] for arena in arenas)))
+    print("Snapshots received: {} ({} full), {:.0f} a second per client".format(
+        snapshots, sum(client.full_snapshots for client in clients), snapshots / elapsed / max(len(clients), 1)))
+    print("Bytes received:     {:.1f} KB/s per client, {:.0f} bytes per snapshot".format(
+        received / elapsed / 1024 / max(len(clients), 1), received / max(snapshots, 1)))
+    print("Client apply time:  {:.3f} ms per snapshot".format(
+        sum(client.apply_time for client in clients) / max(snapshots, 1) * 1000))
+
+    failed = [client for client in clients if client.error is not None]
+    for client in failed:
+        print("{} {}: {}".format(client.arena, "watcher" if client.watch else "player", client.error))
+
+    if args.output:
+        output_file = open(args.output, "w")
+        json.dump({"server": stats,
+                   "clients": [{"arena": client.arena, "watch": client.watch, "snapshots": client.snapshots,
+                                "full_snapshots": client.full_snapshots, "bytes": client.bytes,
+                                "error": client.error} for client in clients]}, output_file, indent=2)
+        output_file.close()
+    if failed or snapshots == 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
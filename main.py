@@ -17,1039 +17,368 @@
 # - Extra lives each 500 points
 # - Time throttle to keep at 60 fps
 import time
+import base64
+import argparse
 import turtle
-import math
-import random
-import winsound
 from turtlewriter import *
+from arena import *
+from audio import default_audio
+from renderer import StatePen, CanvasLayer
+from hud import Hud
+from clock import FixedStepClock
+from profiler import Profiler
+from controls import Controls, Replay, load_recording
+from scores import ScoreKeeper
+from assets import load_bundle
+from background import ImageTiles, StarTiles
+
+
+class Startup:
+    # Wall time of each startup stage, in the order they ran
+    def __init__(self):
+        self.stages = []
+        self.start = time.perf_counter()
 
-SCREEN_WIDTH = 1000
-SCREEN_HEIGHT = 800
-INFO_WIDTH = 200
-INFO_CENTER = SCREEN_WIDTH / 2
-CAMERA_OFFSET = INFO_WIDTH / 2
-COLLISION_CHECK_RANGE = 300
-
-wn = turtle.Screen()
-wn.setup(SCREEN_WIDTH + INFO_WIDTH, SCREEN_HEIGHT)
-wn.title("Space Arena! by @TokyoEdTech")
-wn.bgcolor("black")
-wn.tracer(0)
-
-pen = turtle.Turtle()
-pen.speed(0)
-pen.shape("square")
-pen.color("white")
-pen.penup()
-pen.hideturtle()
-
-game_speed = 0.3
-hs_file = open("highscore.txt", "r")
-high_score = int(hs_file.read())
-hs_file.close()
-
-wn.register_shape("background.gif")
-wn.register_shape("powerup.gif")
-wn.register_shape("powerup2.gif")
-wn.register_shape("powerup3.gif")
-wn.register_shape("bomb.gif")
-wn.register_shape("surveillance.gif")
-wn.register_shape("mine.gif")
-wn.register_shape("hunter.gif")
-
-
-class Game:
-    NUM_FRAME_TIMES = 500
-
-    def __init__(self, width, height):
-        self.target_frame_time = 1 / 60
-        self.frame_time_index = 0
-        self.total_frame_times = 0
-        self.frame_times = []
-        for i in range(Game.NUM_FRAME_TIMES):
-            self.frame_times.append(0.0)
-        self.max_frame_time = 0
-        self.last_frame_time = 0
-        self.width = width
-        self.height = height
-        self.level = 1
-        self.state = "splash"
-
-    def start_level(self):
-        sprites.clear()
-
-        # Add enemy missiles
-        for enemy_missile in enemy_missiles:
-            sprites.append(enemy_missile)
-
-        # Add player
-        sprites.append(player)
-
-        # Add missile
-        for missile in missiles:
-            sprites.append(missile)
-
-        # Add bomb
-        sprites.append(bomb)
-
-        # Add enemies
-        Enemy.count = 2 ** self.level
-        for _ in range(2 ** self.level):
-            # Pick a random location away from the player
-            while True:
-                x = random.randint(-self.width / 2, self.width / 2)
-                y = random.randint(-self.height / 2, self.height / 2)
-                if abs(player.x - x) > COLLISION_CHECK_RANGE or \
-                        abs(player.y - y) > COLLISION_CHECK_RANGE:
-                    break
-            dx = random.randint(-2, 2) * game_speed
-            dy = random.randint(-2, -2) * game_speed
-            sprites.append(Enemy(x, y, dx, dy))
-
-        # Add powerups
-        for _ in range(1):
-            x = random.randint(-self.width / 2, self.width / 2)
-            y = random.randint(-self.height / 2, self.height / 2)
-            dx = random.randint(-2, 2) * game_speed
-            dy = random.randint(-2, -2) * game_speed
-            sprites.append(Powerup(x, y, "powerup.gif", "white", "multishot", dx, dy))
-
-        for _ in range(1):
-            x = random.randint(-self.width / 2, self.width / 2)
-            y = random.randint(-self.height / 2, self.height / 2)
-            dx = random.randint(-2, 2) * game_speed
-            dy = random.randint(-2, -2) * game_speed
-            sprites.append(Powerup(x, y, "powerup2.gif", "green", "heal", dx, dy))
-
-        for _ in range(1):
-            x = random.randint(-self.width / 2, self.width / 2)
-            y = random.randint(-self.height / 2, self.height / 2)
-            dx = random.randint(-2, 2) * game_speed
-            dy = random.randint(-2, -2) * game_speed
-            sprites.append(Powerup(x, y, "powerup3.gif", "yellow", "bomb", dx, dy))
-
-    def render_border(self, pen, x_offset, y_offset):
-        pen.color("white")
-        pen.width(3)
-        pen.penup()
-
-        left = -self.width / 2.0 - x_offset
-        right = self.width / 2.0 - x_offset
-        top = self.height / 2.0 - y_offset
-        bottom = -self.height / 2.0 - y_offset
-
-        pen.goto(left, top)
-        pen.pendown()
-        pen.goto(right, top)
-        pen.goto(right, bottom)
-        pen.goto(left, bottom)
-        pen.goto(left, top)
-        pen.penup()
-
-    def render_info(self, pen, score, highscore, active_enemies):
-        pen.color("#222255")
-        pen.penup()
-        pen.goto(INFO_CENTER, 0)
-        pen.shape("square")
-        pen.setheading(90)
-        pen.shapesize(10, SCREEN_HEIGHT / 20, None)
-        pen.stamp()
-
-        separator_x = INFO_CENTER - INFO_WIDTH / 2
-        pen.color("white")
-        pen.width(3)
-        pen.goto(separator_x, SCREEN_HEIGHT / 2)
-        pen.pendown()
-        pen.goto(separator_x, -SCREEN_HEIGHT / 2)
-
-        pen.penup()
-        pen.color("white")
-        character_pen.scale = 1.0
-        character_pen.draw_string(pen, "SPACE ARENA", INFO_CENTER, 370)
-        character_pen.draw_string(pen, "SCORE {}".format(score), INFO_CENTER, 330)
-        character_pen.draw_string(pen, "HIGH SCORE", INFO_CENTER, 290)
-        character_pen.draw_string(pen, str(highscore), INFO_CENTER, 260)
-        character_pen.draw_string(pen, "ENEMIES {}".format(active_enemies), INFO_CENTER, 220)
-        character_pen.draw_string(pen, "LIVES {}".format(player.lives), INFO_CENTER, 180)
-        character_pen.draw_string(pen, "LEVEL {}".format(game.level), INFO_CENTER, 140)
-        character_pen.draw_string(pen, "MULTISHOTS".format(player.multishot), INFO_CENTER, 100)
-        character_pen.draw_string(pen, str(player.multishot), INFO_CENTER, 70)
-        character_pen.draw_string(pen, "BOMBS {}".format(player.bombs), INFO_CENTER, 30)
-
-    def start(self):
-        self.state = "playing"
-
-    def fps_delay(self):
-        if self.last_frame_time > 0:
-            t = time.time()
-            actual = t - self.last_frame_time
-            if actual > self.max_frame_time:
-                self.max_frame_time = actual
-            self.total_frame_times -= self.frame_times[self.frame_time_index]
-            self.total_frame_times += actual
-            self.frame_times[self.frame_time_index] = actual
-            self.frame_time_index += 1
-            self.frame_time_index %= Game.NUM_FRAME_TIMES
-            delay = self.target_frame_time - actual
-            if delay < 0.0001:
-                delay = 0.0001
-            time.sleep(delay)
-        self.last_frame_time = time.time()
-
-    def print_frame_time_stats(self):
-        avg_frame_time = self.total_frame_times / Game.NUM_FRAME_TIMES
-        print("Target Frame Time:  {}".format(self.target_frame_time))
-        print("Average Frame Time: {}".format(avg_frame_time))
-        print("Max Frame Time:     {}".format(self.max_frame_time))
-
-
-# Splash Screen
-character_pen = CharacterPen("red", 3.0)
-character_pen.draw_string(pen, "SPACE ARENA", 0, 300)
-character_pen.scale = 1.0
-character_pen.draw_string(pen, "Originally by TOKYOEDTECH", 0, 240)
-character_pen.draw_string(pen, "Modified by Doug Myers", 0, 210)
-
-pen.color("white")
-pen.shape("triangle")
-pen.goto(-400, 140)
-pen.shapesize(0.5, 1.0, None)
-pen.stamp()
-pen.shapesize(1.0, 1.0, None)
-character_pen.draw_string(pen, "Player", -400, 100)
-
-pen.shape("powerup2.gif")
-pen.goto(-150, 140)
-pen.stamp()
-character_pen.draw_string(pen, "Heal Powerup", -150, 100)
-
-pen.shape("powerup.gif")
-pen.goto(150, 140)
-pen.stamp()
-character_pen.draw_string(pen, "Multishot Powerup", 150, 100)
-
-pen.shape("powerup3.gif")
-pen.goto(400, 140)
-pen.stamp()
-character_pen.draw_string(pen, "Bomb Powerup", 400, 100)
-
-character_pen.draw_string(pen, "Enemy Droids", 0, 20)
-pen.shape("hunter.gif")
-pen.goto(-300, -20)
-pen.stamp()
-character_pen.draw_string(pen, "Hunter", -300, -60)
-
-pen.shape("mine.gif")
-pen.goto(0, -20)
-pen.stamp()
-character_pen.draw_string(pen, "Mine", 0, -60)
-
-pen.shape("surveillance.gif")
-pen.goto(300, -20)
-pen.stamp()
-character_pen.draw_string(pen, "Surveillance", 300, -60)
-
-character_pen.draw_string(pen, "Up Arrow", -400, -160)
-character_pen.draw_string(pen, "Accelerate", -400, -200)
-
-character_pen.draw_string(pen, "Left Arrow", -150, -160)
-character_pen.draw_string(pen, "Rotate Left", -150, -200)
-
-character_pen.draw_string(pen, "Right Arrow", 150, -160)
-character_pen.draw_string(pen, "Rotate Right", 150, -200)
-
-character_pen.draw_string(pen, "Space", 400, -160)
-character_pen.draw_string(pen, "Fire", 400, -200)
-
-character_pen.scale = 1.0
-character_pen.draw_string(pen, "PRESS S TO START", 0, -300)
-
-wn.tracer(0)
-
-
-class Sprite:
-    # Constructor
-    def __init__(self, x, y, shape, color, dx=0.0, dy=0.0):
-        self.x = x
-        self.y = y
-        self.shape = shape
-        self.color = color
-        self.dx = dx
-        self.dy = dy
-        self.heading = 0
-        self.da = 0
-        self.thrust = 0.0
-        self.acceleration = 0.2 * game_speed
-        self.health = 100
-        self.max_health = 100
-        self.width = 20
-        self.height = 20
-        self.state = "active"
-        self.max_dx = 5 * game_speed
-        self.max_dy = 5 * game_speed
-        self.score = 0
-        self.on_screen = True
-
-    def is_collision(self, other):
-        if self.on_screen and self.x - self.width / 2 < other.x + other.width / 2 and \
-                self.x + self.width / 2 > other.x - other.width / 2 and \
-                self.y - self.height / 2 < other.y + other.height / 2 and \
-                self.y + self.height / 2 > other.y - other.width / 2:
-            return True
-        else:
-            return False
-
-    def bounce(self, other):
-        temp_dx = self.dx
-        temp_dy = self.dy
-
-        self.dx = other.dx
-        self.dy = other.dy
-
-        other.dx = temp_dx
-        other.dy = temp_dy
-
-    def update(self):
-        self.heading += self.da
-        self.heading %= 360
-
-        self.dx += math.cos(math.radians(self.heading)) * self.thrust
-        self.dy += math.sin(math.radians(self.heading)) * self.thrust
-
-        self.x += self.dx
-        self.y += self.dy
-
-        self.border_check()
-
-    def border_check(self):
-        if self.x > game.width / 2.0 - 10:
-            self.x = game.width / 2.0 - 10
-            self.dx *= -1
-
-        elif self.x < -game.width / 2.0 + 10:
-            self.x = -game.width / 2.0 + 10
-            self.dx *= -1
-
-        if self.y > game.height / 2.0 - 10:
-            self.y = game.height / 2.0 - 10
-            self.dy *= -1
-
-        elif self.y < -game.height / 2.0 + 10:
-            self.y = -game.height / 2.0 + 10
-            self.dy *= -1
-
-    def is_on_screen(self, x_offset, y_offset):
-        if self.state != "active":
-            return False
-        x = self.x - x_offset + CAMERA_OFFSET
-        if abs(x) > SCREEN_WIDTH / 2:
-            return False
-        y = self.y - y_offset
-        if abs(y) > SCREEN_HEIGHT / 2:
-            return False
-        return True
-
-    def render(self, pen, x_offset, y_offset):
-        if self.is_on_screen(x_offset, y_offset):
-            pen.goto(self.x - x_offset, self.y - y_offset)
-            pen.setheading(self.heading)
-            pen.shape(self.shape)
-            pen.color(self.color)
-            pen.stamp()
-
-            self.render_health_meter(pen, x_offset, y_offset)
-
-    def render_health_meter(self, pen, x_offset, y_offset):
-        # Draw health meter
-        pen.goto(self.x - x_offset - 10, self.y - y_offset + 20)
-        pen.width(3)
-        pen.pendown()
-        pen.setheading(0)
-
-        if self.health / self.max_health < 0.3:
-            pen.color("red")
-        elif self.health / self.max_health < 0.7:
-            pen.color("yellow")
-        else:
-            pen.color("green")
-
-        pen.fd(20.0 * (self.health / self.max_health))
+    def stage(self, name):
+        return StartupStage(self, name)
 
-        if self.health != self.max_health:
-            pen.color("grey")
-            pen.fd(20.0 * ((self.max_health - self.health) / self.max_health))
+    def report(self):
+        total = time.perf_counter() - self.start
+        print("Startup: " + ", ".join("{} {:.1f} ms".format(name, seconds * 1000)
+                                      for name, seconds in self.stages) +
+              ", total {:.1f} ms".format(total * 1000))
 
-        pen.penup()
 
-    def explode(self, max_size=60):
-        winsound.PlaySound("Explosion+7.wav", winsound.SND_ASYNC)
-        found = False
-        for explosion in explosions:
-            if explosion.state == "ready":
-                explosion.reset(self.x, self.y)
-                explosion.max_size = max_size
-                found = True
-                break
-        if not found:
-            explosion = Explosion(self.x, self.y)
-            explosion.max_size = max_size
-            explosions.append(explosion)
+class StartupStage:
+    def __init__(self, startup, name):
+        self.startup = startup
+        self.name = name
+        self.start = 0.0
 
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
 
-class Player(Sprite):
-    def __init__(self):
-        Sprite.__init__(self, 0, 0, "triangle", "white")
-        self.explode_count = 0
-        self.lives = 3
-        self.score = 0
-        self.heading = 90
-        self.da = 0
-        self.max_dx = 10 * game_speed
-        self.max_dy = 10 * game_speed
-        self.multishot = 0
-        self.bombs = 0
-
-    def rotate_left(self):
-        self.da = 5
-
-    def rotate_right(self):
-        self.da = -5
-
-    def stop_rotation(self):
-        self.da = 0
-
-    def accelerate(self):
-        self.thrust += self.acceleration
-
-    def decelerate(self):
-        self.thrust = 0.0
-
-    def drop_bomb(self):
-        if self.bombs > 0 and bomb.state == "ready":
-            bomb.fire(self.x, self.y)
-            self.bombs -= 1
-
-    def fire(self):
-        num_of_missiles = 0
-        for missile in missiles:
-            if missile.state == "ready":
-                num_of_missiles += 1
-        if num_of_missiles == 0:
-            return
+    def __exit__(self, *exc):
+        self.startup.stages.append((self.name, time.perf_counter() - self.start))
 
-        winsound.PlaySound("Flash-laser-03.wav", winsound.SND_ASYNC)
-        if self.multishot > 0:
-            self.multishot -= 1
-        else:
-            num_of_missiles = 1
-
-        # 1 missile ready
-        if num_of_missiles == 1:
-            for missile in missiles:
-                if missile.state == "ready":
-                    missile.fire(self.x, self.y, self.heading, self.dx, self.dy)
-                    break
-
-        # 2 missiles ready
-        elif num_of_missiles == 2:
-            directions = [-3, 3]
-            for missile in missiles:
-                if missile.state == "ready":
-                    missile.fire(self.x, self.y, self.heading + directions.pop(), self.dx, self.dy)
-
-        # 3 missiles ready
-        elif num_of_missiles >= 3:
-            directions = [0, -5, 5]
-            for missile in missiles:
-                if missile.state == "ready":
-                    missile.fire(self.x, self.y, self.heading + directions.pop(), self.dx, self.dy)
-
-    def update(self):
-        if self.state == "active":
-            self.heading += self.da
-            self.heading %= 360
-
-            self.dx += math.cos(math.radians(self.heading)) * self.thrust
-            self.dy += math.sin(math.radians(self.heading)) * self.thrust
-
-            # Set max speed
-            if self.dx > self.max_dx:
-                self.dx = self.max_dx
-            elif self.dx < -self.max_dx:
-                self.dx = -self.max_dx
-
-            if self.dy > self.max_dy:
-                self.dy = self.max_dy
-            elif self.dy < -self.max_dy:
-                self.dy = -self.max_dy
-
-            self.x += self.dx
-            self.y += self.dy
-
-            self.border_check()
-
-            # Check health
-            if self.health <= 0:
-                self.state = "exploding"
-                self.explode_count = 60
-                self.color = "black"
-                self.explode()
-
-        elif self.state == "exploding":
-            self.explode_count -= 1
-            if self.explode_count <= 0:
-                self.reset()
-
-    def reset(self):
-        global game_over
-        self.lives -= 1
-        if self.lives > 0:
-            # Pick a random location away from enemies
-            range = COLLISION_CHECK_RANGE
-            while True:
-                self.x = random.randint(-game.width / 2, game.width / 2)
-                self.y = random.randint(-game.height / 2, game.height / 2)
-                found = True
-                for sprite in sprites:
-                    if isinstance(sprite, Enemy) and \
-                            abs(sprite.x - self.x) < range and \
-                            abs(sprite.y - self.y) < range:
-                        found = False
-                        break
-                if found:
-                    break
-                range -= 1
-            self.health = self.max_health
-            self.heading = 90
-            self.dx = 0
-            self.dy = 0
-            self.state = "active"
-            self.color = "white"
-        else:
-            game_over = True
-
-    def render(self, pen, x_offset, y_offset):
-        if self.thrust > 0:
-            # Render rocket fire
-            flame = self.thrust / 2.0
-            x = self.x - 10 * math.cos(math.radians(self.heading))
-            y = self.y - 10 * math.sin(math.radians(self.heading))
-            if flame > 0.5:
-                flame = 0.5
-            pen.shapesize(0.2, flame, None)
-            pen.goto(x - x_offset, y - y_offset)
-            pen.setheading(self.heading + 180)
-            pen.shape("triangle")
-            pen.color("yellow")
-            pen.stamp()
-        pen.shapesize(0.5, 1.0, None)
-        pen.goto(self.x - x_offset, self.y - y_offset)
-        pen.setheading(self.heading)
-        pen.shape(self.shape)
-        pen.color(self.color)
-        pen.stamp()
-
-        pen.shapesize(1.0, 1.0, None)
-
-        self.render_health_meter(pen, x_offset, y_offset)
-
-
-class Missile(Sprite):
-    max_fuel = 200
 
-    def __init__(self):
-        Sprite.__init__(self, 0, 0, "circle", "yellow")
-        self.state = "ready"
-        self.thrust = 8.0
-        self.fuel = Missile.max_fuel
-        self.height = 4
-        self.width = 4
-
-    def fire(self, x, y, heading, dx, dy):
-        if self.state == "ready":
-            self.state = "active"
-            self.x = x
-            self.y = y
-            self.heading = heading
-            self.dx = dx
-            self.dy = dy
-
-            self.dx += math.cos(math.radians(self.heading)) * self.thrust
-            self.dy += math.sin(math.radians(self.heading)) * self.thrust
-
-    def update(self):
-        if self.state == "active":
-            self.fuel -= self.thrust
-            if self.fuel <= 0:
-                self.reset()
-
-            self.heading += self.da
-            self.heading %= 360
-
-            self.x += self.dx
-            self.y += self.dy
-
-            self.border_check()
-
-    def reset(self):
-        self.fuel = Missile.max_fuel
-        self.dx = 0
-        self.dy = 0
-        self.state = "ready"
-
-    def render(self, pen, x_offset, y_offset):
-        if self.is_on_screen(x_offset, y_offset):
-            pen.shapesize(0.2, 0.2, None)
-            pen.goto(self.x - x_offset, self.y - y_offset)
-            pen.setheading(self.heading)
-            pen.shape(self.shape)
-            pen.color(self.color)
-            pen.stamp()
-
-            pen.shapesize(1.0, 1.0, None)
-
-
-class Bomb(Sprite):
-    max_fuse = 50
+class ShapeLoader:
+    # Registers an image shape the first time a pen uses it, from the asset
+    # bundle if there is one and from the GIF file if not
+    def __init__(self, wn, bundle):
+        self.wn = wn
+        self.bundle = bundle
+        self.registered = set(wn.getshapes())
 
-    def __init__(self):
-        Sprite.__init__(self, 0, 0, "bomb.gif", "yellow")
-        self.state = "ready"
-        self.thrust = 8.0
-        self.fuse = Bomb.max_fuse
-        self.height = 10
-        self.width = 10
-
-    def fire(self, x, y):
-        if self.state == "ready":
-            self.state = "active"
-            self.x = x
-            self.y = y
-
-    def update(self):
-        if self.state == "active":
-            self.fuse -= 1
-            if self.fuse <= 0:
-                self.reset()
-                self.explode(200)
-
-    def reset(self):
-        self.fuse = Bomb.max_fuse
-        self.state = "ready"
-
-    def render(self, pen, x_offset, y_offset):
-        if self.is_on_screen(x_offset, y_offset):
-            pen.goto(self.x - x_offset, self.y - y_offset)
-            pen.shape(self.shape)
-            pen.color(self.color)
-            pen.stamp()
-
-
-class EnemyMissile(Sprite):
-    max_fuel = 200
+    def image(self, name):
+        if self.bundle is not None and name in self.bundle:
+            return turtle.TK.PhotoImage(master=self.wn.getcanvas(),
+                                        data=base64.b64encode(self.bundle.image(name)))
+        return turtle.TK.PhotoImage(master=self.wn.getcanvas(), file=name)
 
-    def __init__(self):
-        Sprite.__init__(self, 0, 0, "circle", "red")
-        self.state = "ready"
-        self.thrust = 8.0
-        self.fuel = EnemyMissile.max_fuel
-        self.height = 4
-        self.width = 4
-
-    def fire(self, x, y, heading, dx, dy):
-        if self.state == "ready":
-            winsound.PlaySound("Flash-laser-02.wav", winsound.SND_ASYNC)
-            self.state = "active"
-            self.x = x
-            self.y = y
-            self.heading = heading
-            self.dx = dx
-            self.dy = dy
-
-            self.dx += math.cos(math.radians(self.heading)) * self.thrust
-            self.dy += math.sin(math.radians(self.heading)) * self.thrust
-
-    def update(self):
-        if self.state == "active":
-            self.fuel -= self.thrust
-            if self.fuel <= 0:
-                self.reset()
-
-            self.heading += self.da
-            self.heading %= 360
-
-            self.x += self.dx
-            self.y += self.dy
-
-            self.border_check()
-
-    def reset(self):
-        self.fuel = EnemyMissile.max_fuel
-        self.dx = 0
-        self.dy = 0
-        self.state = "ready"
-
-    def render(self, pen, x_offset, y_offset):
-        if self.is_on_screen(x_offset, y_offset):
-            pen.shapesize(0.2, 0.2, None)
-            pen.goto(self.x - x_offset, self.y - y_offset)
-            pen.setheading(self.heading)
-            pen.shape(self.shape)
-            pen.color(self.color)
-            pen.stamp()
-
-            pen.shapesize(1.0, 1.0, None)
-
-
-class Explosion(Sprite):
-    def __init__(self, x, y):
-        Sprite.__init__(self, x, y, "circle", "yellow")
-        self.time = 0
-        self.max_time = 10
-        self.max_size = 60
-        self.colors = ["yellow", "orange", "red", "dark red"]
-
-    def reset(self, x, y):
-        self.x = x
-        self.y = y
-        self.time = 0
-        self.width = 20
-        self.height = 20
-        self.state = "active"
-
-    def update(self):
-        if self.state == "active":
-            self.time += 1
-            self.width = 20 + (self.max_size - 20) * self.time / self.max_time
-            self.height = self.width
-            if self.time >= self.max_time:
-                self.state = "ready"
-
-    def render(self, pen, x_offset, y_offset):
-        if self.state == "active":
-            if self.is_on_screen(x_offset, y_offset):
-                i = len(self.colors) * self.time // (self.max_time + 1)
-                size = self.width / 20
-                pen.shapesize(size, size, None)
-                pen.goto(self.x - x_offset, self.y - y_offset)
-                pen.shape(self.shape)
-                pen.color(self.colors[i])
-                pen.stamp()
-
-                pen.shapesize(1.0, 1.0, None)
-
-
-class Enemy(Sprite):
-    count = 0
-
-    def __init__(self, x, y, dx, dy):
-        self.type = random.choice(["hunter", "mine", "surveillance"])
-        if self.type == "hunter":
-            Sprite.__init__(self, x, y, "hunter.gif", "red", dx, dy)
-            self.score = 10
-        elif self.type == "mine":
-            Sprite.__init__(self, x, y, "mine.gif", "orange", dx, dy)
-            self.score = 5
+    def ensure(self, name):
+        if name in self.registered:
+            return
+        if self.bundle is not None and name in self.bundle:
+            self.wn.register_shape(name, turtle.Shape("image", self.image(name)))
         else:
-            Sprite.__init__(self, x, y, "surveillance.gif", "pink", dx, dy)
-            self.score = 5
-
-        self.max_health = 20
-        self.health = self.max_health
-
-    def update(self):
-        if self.state == "active":
-            self.heading += self.da
-            self.heading %= 360
-
-            self.dx += math.cos(math.radians(self.heading)) * self.thrust
-            self.dy += math.sin(math.radians(self.heading)) * self.thrust
-
-            self.x += self.dx
-            self.y += self.dy
-
-            self.border_check()
-
-            # Check health
-            if self.health <= 0:
-                self.reset()
-
-            # Code for different types
-            if self.type == "hunter":
-                if random.random() < 0.75:
-                    if self.x < player.x and player.x - self.x < 200:
-                        self.dx += 0.05
-                    elif self.x > player.x and self.x - player.x < 200:
-                        self.dx -= 0.05
-                    if self.y < player.y and player.y - self.y < 200:
-                        self.dy += 0.05
-                    elif self.y > player.y and self.y - player.y < 200:
-                        self.dy -= 0.05
-
-            elif self.type == "mine":
-                self.dx = 0
-                self.dy = 0
-
-            elif self.type == "surveillance":
-                if self.x < player.x and player.x - self.x < 100:
-                    self.dx -= 0.05
-                elif self.x > player.x and self.x - player.x < 100:
-                    self.dx += 0.05
-                if self.y < player.y and player.y - self.y < 100:
-                    self.dy -= 0.05
-                elif self.y > player.y and self.y - player.y < 100:
-                    self.dy += 0.05
-
-            # Set max speed
-            if self.dx > self.max_dx:
-                self.dx = self.max_dx
-            elif self.dx < -self.max_dx:
-                self.dx = -self.max_dx
-
-            if self.dy > self.max_dy:
-                self.dy = self.max_dy
-            elif self.dy < -self.max_dy:
-                self.dy = -self.max_dy
-
-    def reset(self):
-        global high_score
-        self.state = "inactive"
-        Enemy.count -= 1
-        self.explode()
-        player.score += self.score
-        if player.score % 500 < self.score:
-            winsound.PlaySound("powerup.wav", winsound.SND_ASYNC)
-            player.lives += 1
-        if player.score > high_score:
-            high_score = player.score
-            hs_file = open("highscore.txt", "w")
-            hs_file.write(str(high_score))
-            hs_file.close()
-
-
-class Powerup(Sprite):
-    def __init__(self, x, y, shape, color, type, dx, dy):
-        Sprite.__init__(self, x, y, shape, color, dx, dy)
-        self.type = type
-
-    def reset(self):
-        winsound.PlaySound("powerup.wav", winsound.SND_ASYNC)
-        if self.type == "multishot":
-            player.multishot += 20
-            if player.multishot > 50:
-                player.multishot = 50
-        elif self.type == "heal":
-            player.health += 50
-            if player.health > 100:
-                player.health = 100
-        else:  # bomb
-            player.bombs += 1
-            if player.bombs > 1:
-                player.bombs = 1
-
-        self.x = random.randint(-game.width / 2, game.width / 2)
-        self.y = random.randint(-game.height / 2, game.height / 2)
-
-
-class Camera:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-    def update(self, x, y):
-        self.x = x
-        self.y = y
-
-
-class Radar:
-    def __init__(self, x, y, radius):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.range = 1000
-
-    def render(self, pen, sprites):
-
-        # Draw radar circle
-        pen.color("white")
-        pen.setheading(90)
-        pen.goto(self.x + self.radius, self.y)
-        pen.pendown()
-        pen.circle(self.radius)
-        pen.penup()
-
-        # Draw sprites
-        for sprite in sprites:
-            if sprite.state == "active":
-
-                # Make sure the sprite is close to the player
-                distance = ((player.x - sprite.x) ** 2 + (player.y - sprite.y) ** 2) ** 0.5
-                if distance < self.range:
-                    radar_x = self.x + (sprite.x - player.x) * (self.radius / self.range)
-                    radar_y = self.y + (sprite.y - player.y) * (self.radius / self.range)
-                    pen.goto(radar_x, radar_y)
-                    pen.color(sprite.color)
-                    pen.shape("circle")
-                    pen.shapesize(0.1, 0.1, None)
-                    pen.stamp()
-
-
-# Create game object
-game = Game(2000, 2000)
-
-# Create the radar object
-radar = Radar(INFO_CENTER, -SCREEN_HEIGHT / 2 + 100, 90)
-
-# Create player sprite
-player = Player()
-
-# Create camera
-camera = Camera(player.x + CAMERA_OFFSET, player.y)
-
-# Create missile objects
-missiles = []
-for _ in range(3):
-    missiles.append(Missile())
-
-enemy_missiles = []
-for _ in range(3):
-    enemy_missiles.append(EnemyMissile())
-
-# Create bomb object
-bomb = Bomb()
-
-explosions = []
-
-# Sprites list
-sprites = []
-
-# Set up the level
-game.start_level()
-
-# Keyboard bindings
-wn.listen()
-wn.onkeypress(player.rotate_left, "Left")
-wn.onkeypress(player.rotate_right, "Right")
-
-wn.onkeyrelease(player.stop_rotation, "Left")
-wn.onkeyrelease(player.stop_rotation, "Right")
-
-wn.onkeypress(player.accelerate, "Up")
-wn.onkeyrelease(player.decelerate, "Up")
-
-wn.onkeypress(player.fire, "space")
-wn.onkeypress(player.drop_bomb, "Down")
+            self.wn.register_shape(name)
+        self.registered.add(name)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Space Arena!")
+    parser.add_argument("--seed", type=int, help="seed for a repeatable game")
+    # A replay has no key presses of its own to record
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument("--record", metavar="FILE", help="save the seed and every key press to FILE")
+    recording.add_argument("--replay", metavar="FILE", help="play back a game saved with --record")
+    parser.add_argument("--trace", action="store_true", help="write a frame trace to trace.json")
+    parser.add_argument("--wav", metavar="FILE", help="write the game's sound to FILE instead of playing it")
+    parser.add_argument("--stars", action="store_true", help="add a layer of distant stars behind the arena")
+    return parser.parse_args(argv)
+
+
+def open_window(bundle):
+    wn = turtle.Screen()
+    wn.setup(SCREEN_WIDTH + INFO_WIDTH, SCREEN_HEIGHT)
+    wn.title("Space Arena! by @TokyoEdTech")
+    wn.bgcolor("black")
+    wn.tracer(0)
+
+    pen = turtle.Turtle()
+    pen.speed(0)
+    pen.shape("square")
+    pen.color("white")
+    pen.penup()
+    pen.hideturtle()
+
+    # Only send the turtle calls that change something, registering image
+    # shapes as they are first needed
+    return wn, StatePen(pen, ShapeLoader(wn, bundle))
+
+
+def draw_splash(pen, character_pen):
+    character_pen.scale = 3.0
+    character_pen.draw_string(pen, "SPACE ARENA", 0, 300)
+    character_pen.scale = 1.0
+    character_pen.draw_string(pen, "Originally by TOKYOEDTECH", 0, 240)
+    character_pen.draw_string(pen, "Modified by Doug Myers", 0, 210)
+
+    pen.color("white")
+    pen.shape("triangle")
+    pen.goto(-400, 140)
+    pen.shapesize(0.5, 1.0, None)
+    pen.stamp()
+    pen.shapesize(1.0, 1.0, None)
+    character_pen.draw_string(pen, "Player", -400, 100)
+
+    pen.shape("powerup2.gif")
+    pen.goto(-150, 140)
+    pen.stamp()
+    character_pen.draw_string(pen, "Heal Powerup", -150, 100)
+
+    pen.shape("powerup.gif")
+    pen.goto(150, 140)
+    pen.stamp()
+    character_pen.draw_string(pen, "Multishot Powerup", 150, 100)
+
+    pen.shape("powerup3.gif")
+    pen.goto(400, 140)
+    pen.stamp()
+    character_pen.draw_string(pen, "Bomb Powerup", 400, 100)
+
+    character_pen.draw_string(pen, "Enemy Droids", 0, 20)
+    pen.shape("hunter.gif")
+    pen.goto(-300, -20)
+    pen.stamp()
+    character_pen.draw_string(pen, "Hunter", -300, -60)
+
+    pen.shape("mine.gif")
+    pen.goto(0, -20)
+    pen.stamp()
+    character_pen.draw_string(pen, "Mine", 0, -60)
+
+    pen.shape("surveillance.gif")
+    pen.goto(300, -20)
+    pen.stamp()
+    character_pen.draw_string(pen, "Surveillance", 300, -60)
+
+    character_pen.draw_string(pen, "Up Arrow", -400, -160)
+    character_pen.draw_string(pen, "Accelerate", -400, -200)
+
+    character_pen.draw_string(pen, "Left Arrow", -150, -160)
+    character_pen.draw_string(pen, "Rotate Left", -150, -200)
+
+    character_pen.draw_string(pen, "Right Arrow", 150, -160)
+    character_pen.draw_string(pen, "Rotate Right", 150, -200)
+
+    character_pen.draw_string(pen, "Space", 400, -160)
+    character_pen.draw_string(pen, "Fire", 400, -200)
+
+    character_pen.scale = 1.0
+    character_pen.draw_string(pen, "PRESS S TO START", 0, -300)
+
+
+def new_hud_pen():
+    # Each value in the info panel gets its own turtle
+    hud_turtle = turtle.Turtle()
+    hud_turtle.speed(0)
+    hud_turtle.penup()
+    hud_turtle.hideturtle()
+    return StatePen(hud_turtle)
+
+
+def bind_keys(wn, game, controls):
+    # Key presses reach the player at the start of the next tick; when
+    # replaying they come from the recording instead
+    wn.listen()
+    if isinstance(controls, Controls):
+        wn.onkeypress(controls.command("rotate_left"), "Left")
+        wn.onkeypress(controls.command("rotate_right"), "Right")
+
+        wn.onkeyrelease(controls.command("stop_rotation"), "Left")
+        wn.onkeyrelease(controls.command("stop_rotation"), "Right")
+
+        wn.onkeypress(controls.command("accelerate"), "Up")
+        wn.onkeyrelease(controls.command("decelerate"), "Up")
+
+        wn.onkeypress(controls.command("fire"), "space")
+        wn.onkeypress(controls.command("drop_bomb"), "Down")
+
+    wn.onkeypress(game.start, "s")
+    wn.onkeypress(game.start, "S")
+
+
+def main(argv=None):
+    startup = Startup()
+
+    with startup.stage("config"):
+        args = parse_args(argv)
+        seed = args.seed
+        commands = None
+        if args.replay:
+            seed, commands, _ = load_recording(args.replay)
+
+        # Scores are saved in the background; the high score comes from
+        # highscore.txt (or the leaderboard if that's missing)
+        scores = ScoreKeeper("highscore.txt", "scores.db")
+
+    # Images and decoded sounds, mapped from assets.bundle (built if it is
+    # missing or older than the files in assets.json)
+    with startup.stage("assets"):
+        bundle = load_bundle()
+
+    with startup.stage("window"):
+        wn, pen = open_window(bundle)
 
-wn.onkeypress(game.start, "s")
-wn.onkeypress(game.start, "S")
-
-wn.onkeypress(game.print_frame_time_stats, "f")
-
-# Main Loop
-game_over = False
-while not game_over:
-    # Splash
-    if game.state == "splash":
+    # Put the splash screen up before building the world, so there is
+    # something to look at while the rest loads
+    with startup.stage("splash"):
+        character_pen = CharacterPen("red", 3.0)
+        draw_splash(pen, character_pen)
         wn.update()
 
-    elif game.state == "playing":
-        # Main Game
-        # Clear screen
-        pen.clear()
-
-        # Render background
-        pen.goto(-camera.x, -camera.y)
-        pen.shape("background.gif")
-        pen.stamp()
-
-        # Do game stuff
-        # Update sprites
-        for sprite in sprites:
-            sprite.update()
-
-        # Update explosions
-        for explosion in explosions:
-            explosion.update()
-
-        # Fire enemy missiles
-        for sprite in sprites:
-            if abs(player.x - sprite.x) < COLLISION_CHECK_RANGE and \
-                    abs(player.y - sprite.y) < COLLISION_CHECK_RANGE:
-                if isinstance(sprite, Enemy) and sprite.state == "active":
-                    for enemy_missile in enemy_missiles:
-                        if enemy_missile.state == "ready" and random.random() < 0.01:
-                            # Fire the missile
-                            heading = math.atan2(player.y - sprite.y, player.x - sprite.x)
-                            heading = heading * (180 / 3.14159)
-                            enemy_missile.fire(sprite.x, sprite.y, heading, sprite.dx, sprite.dy)
-                            break
-
-                    # Check for collisions
-                    if player.is_collision(sprite):
-                        sprite.health -= 10
-                        player.health -= 10
-                        player.bounce(sprite)
-
-                    for missile in missiles:
-                        if missile.state == "active" and missile.is_collision(sprite):
-                            sprite.health -= 10
-                            missile.reset()
-
-                    if bomb.state == "active" and bomb.is_collision(sprite):
-                        bomb.fuse = 0
-
-                    for explosion in explosions:
-                        if explosion.state == "active" and explosion.is_collision(sprite):
-                            sprite.health -= 5
-
-                if isinstance(sprite, Powerup):
-                    if player.is_collision(sprite):
-                        sprite.reset()
-                    else:
-                        for missile in missiles:
-                            if missile.state == "active" and missile.is_collision(sprite):
-                                sprite.reset()
-                                missile.reset()
-
-                # Enemy Missile Collisions with Player
-                if isinstance(sprite, EnemyMissile):
-                    if sprite.state == "active" and sprite.is_collision(player):
-                        sprite.reset()
-                        player.health -= 10
-
-        for explosion in explosions:
-            if explosion.state == "active" and explosion.is_collision(player):
-                player.health -= 5
-
-        # Update the camera
-        camera.update(player.x + CAMERA_OFFSET, player.y)
-
-        # Render sprites
-        for sprite in sprites:
-            sprite.render(pen, camera.x, camera.y)
-
-        # Render explosions
-        for explosion in explosions:
-            explosion.render(pen, camera.x, camera.y)
-
-        game.render_border(pen, camera.x, camera.y)
-
-        # Check for end of level
-        if Enemy.count == 0:
-            game.level += 1
-            game.start_level()
-
-        # Draw text
-        game.render_info(pen, player.score, high_score, Enemy.count)
-
-        # Render the radar
-        radar.render(pen, sprites)
-
-        game.fps_delay()
-
-        # Update the screen
-        wn.update()
+    with startup.stage("world"):
+        game = Game(2000, 2000, default_audio(args.wav, bundle), scores.high_score, scores, seed)
+        player = game.player
+        scores.start(game.seed)
+
+        # Never spend more than 2 ms of a frame spawning enemies, unless the
+        # game has to be repeatable (the budget depends on the wall clock)
+        if not args.record and not args.replay:
+            game.spawner.time_budget = 0.002
+        game.report_memory = True
+
+        # Time each phase of the frame; run with --trace to also write
+        # trace.json (open it in chrome://tracing or ui.perfetto.dev)
+        profiler = Profiler(trace=args.trace)
+        game.profiler = profiler
+
+        hud = Hud(game, character_pen, new_hud_pen, CanvasLayer(wn.getcanvas(), "hud"))
+
+        # The background is tiled and only the tiles in view are on the
+        # canvas, with an optional star layer scrolling at half speed on top
+        canvas = wn.getcanvas()
+        background = ImageTiles(canvas, pen.shapes.image("background.gif"),
+                                view_width=SCREEN_WIDTH + INFO_WIDTH, view_height=SCREEN_HEIGHT)
+        layers = [background]
+        if args.stars:
+            layers.append(StarTiles(canvas, view_width=SCREEN_WIDTH + INFO_WIDTH, view_height=SCREEN_HEIGHT,
+                                    above=background, seed=game.seed))
+        radar = Radar(INFO_CENTER, -SCREEN_HEIGHT / 2 + 100, 90)
+        camera = Camera(player.x + CAMERA_OFFSET, player.y)
+
+        # Simulate at a fixed TICK_RATE ticks a second whatever the frame rate,
+        # catching up at most 5 ticks in one frame
+        clock = FixedStepClock(render_rate=60, max_steps=5)
+
+        # Set up the level
+        game.start_level()
+
+        if args.replay:
+            controls = Replay(game, commands)
+        else:
+            controls = Controls(game)
+        bind_keys(wn, game, controls)
+
+    startup.report()
+
+    def print_stats():
+        clock.print_stats()
+        game.print_pool_stats()
+        profiler.print_stats()
+        if profiler.trace is not None:
+            profiler.save_trace("trace.json")
+        print("Turtle Calls:       {}".format(pen.stats()))
+        print("HUD Turtle Calls:   {}".format(hud.stats()))
+        print("Audio:              {}".format(game.audio.stats()))
+        for layer in layers:
+            print("{:20}{}".format(layer.tag.capitalize() + " Tiles:", layer.stats()))
+
+    wn.onkeypress(print_stats, "f")
+
+    # Save the recording, flush the scores and stop the sound however the
+    # game ends (game over, closing the window or Ctrl-C)
+    try:
+        # Main Loop
+        while game.state != "game over":
+            # Splash
+            if game.state == "splash":
+                wn.update()
+                clock.reset()
+
+            elif game.state == "playing":
+                # Main Game
+                profiler.begin_frame()
+                pen.begin_frame()
+
+                # Do game stuff, as many ticks as are due
+                for _ in range(clock.advance()):
+                    controls.apply()
+                    game.update()
+                    if game.state != "playing":
+                        break
 
-character_pen.scale = 3.0
-character_pen.draw_string(pen, "GAME OVER", 0, 0)
-wn.mainloop()
+                # Update the camera, between the last two ticks
+                alpha = clock.alpha()
+                lag = 1.0 - alpha
+                camera.update(player.x + CAMERA_OFFSET - player.dx * lag, player.y - player.dy * lag)
+
+                with profiler.phase("render"):
+                    # Clear screen
+                    pen.clear()
+
+                # Scroll the background, adding and removing tiles at their edges
+                with profiler.phase("background"):
+                    for layer in layers:
+                        layer.update(camera.x, camera.y)
+
+                # Render sprites, explosions and border, grouping the stamps
+                pen.begin_batch()
+                game.render(pen, camera, alpha)
+                with profiler.phase("render"):
+                    pen.end_batch()
+
+                # Draw text (only the values that changed)
+                with profiler.phase("hud"):
+                    hud.render()
+
+                # Render the radar
+                with profiler.phase("radar"):
+                    pen.begin_batch()
+                    radar.render(pen, player, game.world)
+                    pen.end_batch()
+                pen.end_frame()
+
+                with profiler.phase("wait"):
+                    clock.wait()
+
+                # Update the screen
+                with profiler.phase("wn.update"):
+                    wn.update()
+                profiler.end_frame()
+    finally:
+        if args.record:
+            controls.save(args.record)
+        scores.close()
+        game.audio.close()
+
+    character_pen.scale = 3.0
+    character_pen.draw_string(pen, "GAME OVER", 0, 0)
+
+    # Leaderboard
+    character_pen.scale = 1.0
+    character_pen.draw_string(pen, "BEST GAMES", 0, -80)
+    y = -120
+    for score, level, started in scores.top(5):
+        character_pen.draw_string(pen, "{}  LEVEL {}".format(score, level), 0, y)
+        y -= 30
+    if profiler.trace is not None:
+        profiler.save_trace("trace.json")
+    wn.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# Space Arena network protocol
+# Every message is a 4 byte little-endian length, a type byte and a body.
+# Clients send JSON (joining an arena, key commands); the server sends JSON
+# replies and world snapshots.
+#
+# A snapshot holds every sprite in the arena as a fixed-size record, with
+# its position quantized to 1 / POSITION_SCALE of a unit and its heading to
+# a byte. A client is only sent the records that differ from the last
+# snapshot it was sent (the connection is TCP, so that one arrived) and the
+# ids of the sprites that have gone; a client with nothing to diff against
+# is sent every record. The body is the header, the removed ids and then
+# the changed records, sorted by id.
+import json
+import struct
+import numpy as np
+import arena
+from arena import *
+from swarm import HUNTER, MINE, SURVEILLANCE
+
+JSON = 1
+SNAPSHOT = 2
+
+LENGTH = struct.Struct("<I")
+
+# Sequence number, sequence number diffed against (FULL if none), game
+# state, score, high score, enemies left, lives, level, multishot, bombs,
+# removed ids and changed records
+HEADER = struct.Struct("<IIBIIIHHHHII")
+FULL = 0xFFFFFFFF
+STATES = ("splash", "playing", "game over")
+
+RECORD = np.dtype([("id", "<u4"), ("kind", "u1"), ("x", "<i2"), ("y", "<i2"),
+                   ("heading", "u1"), ("value", "u1"), ("size", "u1")])
+POSITION_SCALE = 4
+
+# Widest arena whose positions fit the records' int16 x and y (Game
+# needs an even width and height)
+MAX_ARENA_SIZE = 2 * (32767 // POSITION_SCALE)
+
+# How each kind of record is drawn: the arena class whose render method
+# draws it, its shape and its colour. value is the health as a fraction of
+# 255 (an explosion's time instead) and size an explosion's width or the
+# player's thrust as a fraction of 255.
+LOOKS = (("Player", "triangle", "white"),
+         ("Player", "triangle", "black"),
+         ("Missile", "circle", "yellow"),
+         ("EnemyMissile", "circle", "red"),
+         ("Bomb", "bomb.gif", "yellow"),
+         ("Explosion", "circle", "yellow"),
+         ("Body", "hunter.gif", "red"),
+         ("Body", "mine.gif", "orange"),
+         ("Body", "surveillance.gif", "pink"),
+         ("Powerup", "powerup.gif", "white"),
+         ("Powerup", "powerup2.gif", "green"),
+         ("Powerup", "powerup3.gif", "yellow"))
+LOOK_CODES = {look: code for code, look in enumerate(LOOKS)}
+
+# Look of each swarm type code
+ENEMY_LOOKS = np.zeros(3, dtype=np.uint8)
+ENEMY_LOOKS[HUNTER] = LOOK_CODES[("Body", "hunter.gif", "red")]
+ENEMY_LOOKS[MINE] = LOOK_CODES[("Body", "mine.gif", "orange")]
+ENEMY_LOOKS[SURVEILLANCE] = LOOK_CODES[("Body", "surveillance.gif", "pink")]
+
+# The player is always id 0, other sprites get ids from 1 and enemies
+# are ENEMY_ID plus their swarm serial number
+PLAYER_ID = 0
+ENEMY_ID = 1 << 16
+
+
+def message(kind, body):
+    return LENGTH.pack(len(body) + 1) + bytes((kind,)) + body
+
+
+def json_message(value):
+    return message(JSON, json.dumps(value).encode())
+
+
+async def read_message(reader):
+    # (type, body) of the next message from an asyncio stream
+    length = LENGTH.unpack(await reader.readexactly(LENGTH.size))[0]
+    data = await reader.readexactly(length)
+    return data[0], data[1:]
+
+
+class MessageBuffer:
+    # Splits bytes read from a non-blocking socket into messages
+    def __init__(self):
+        self.data = bytearray()
+
+    def feed(self, data):
+        self.data += data
+
+    def messages(self):
+        while len(self.data) >= LENGTH.size:
+            length = LENGTH.unpack_from(self.data)[0]
+            end = LENGTH.size + length
+            if len(self.data) < end:
+                break
+            data = bytes(self.data[LENGTH.size:end])
+            del self.data[:end]
+            yield data[0], data[1:]
+
+
+def sprite_values(sprite):
+    # value and size fields of a sprite's record
+    if isinstance(sprite, Explosion):
+        return sprite.time, min(int(sprite.width), 255)
+    health = int(round(max(min(sprite.health / sprite.max_health, 1.0), 0.0) * 255))
+    if isinstance(sprite, Player):
+        return health, int(round(max(min(sprite.thrust, 1.0), 0.0) * 255))
+    return health, 0
+
+
+def capture(game, ids):
+    # Records of everything the game would draw, sorted by id; ids holds
+    # the id given to each sprite other than the player and the enemies
+    sprites = [sprite for sprite in game.world if not isinstance(sprite, Enemy)]
+    sprites += game.explosions.in_use
+    swarm = game.swarm
+    n = swarm.count
+    live = np.flatnonzero(swarm.state[:n] == ACTIVE)
+    records = np.empty(len(sprites) + len(live), dtype=RECORD)
+
+    x = np.empty(len(records))
+    y = np.empty(len(records))
+    heading = np.empty(len(records))
+    for i, sprite in enumerate(sprites):
+        if sprite is game.player:
+            records[i]["id"] = PLAYER_ID
+        else:
+            if sprite not in ids:
+                ids[sprite] = len(ids) + 1
+            records[i]["id"] = ids[sprite]
+        records[i]["kind"] = LOOK_CODES[(type(sprite).__name__, sprite.shape, sprite.color)]
+        records[i]["value"], records[i]["size"] = sprite_values(sprite)
+        x[i] = sprite.x
+        y[i] = sprite.y
+        heading[i] = sprite.heading
+
+    enemies = records[len(sprites):]
+    enemies["id"] = ENEMY_ID + swarm.serial[live]
+    enemies["kind"] = ENEMY_LOOKS[swarm.type[live]]
+    enemies["value"] = np.rint(np.clip(swarm.health[live] / Enemy.max_health, 0, 1) * 255)
+    enemies["size"] = 0
+    x[len(sprites):] = swarm.x[live]
+    y[len(sprites):] = swarm.y[live]
+    heading[len(sprites):] = swarm.heading[live]
+
+    records["x"] = np.clip(np.rint(x * POSITION_SCALE), -32768, 32767)
+    records["y"] = np.clip(np.rint(y * POSITION_SCALE), -32768, 32767)
+    records["heading"] = np.rint(np.remainder(heading, 360) * (256 / 360)).astype(np.int64) % 256
+    return records[np.argsort(records["id"], kind="stable")]
+
+
+def diff(base, records):
+    # Ids in base that aren't in records, and the records that are new or
+    # different
+    if len(base) == 0:
+        return np.zeros(0, dtype="<u4"), records
+    at = np.minimum(np.searchsorted(base["id"], records["id"]), len(base) - 1)
+    same = (base["id"][at] == records["id"]) & (base[at] == records)
+    removed = base["id"][~np.isin(base["id"], records["id"], assume_unique=True)]
+    return removed, records[~same]
+
+
+def snapshot_message(sequence, base, game, removed, records):
+    player = game.player
+    header = HEADER.pack(sequence, FULL if base is None else base, STATES.index(game.state),
+                         player.score, game.high_score, game.enemy_count, min(player.lives, 0xFFFF),
+                         game.level, player.multishot, player.bombs, len(removed), len(records))
+    return message(SNAPSHOT, header + removed.astype("<u4").tobytes() + records.tobytes())
+
+
+class PlayerStatus:
+    def __init__(self):
+        self.score = 0
+        self.lives = 0
+        self.multishot = 0
+        self.bombs = 0
+
+
+class Mirror:
+    # A client's copy of an arena, built up from the snapshots it is sent.
+    # It has the attributes the Hud reads from a Game, and ghosts: objects
+    # of the arena classes carrying just what their render methods use.
+    def __init__(self, width=2000, height=2000):
+        self.width = width
+        self.height = height
+        self.sequence = None
+        self.records = np.zeros(0, dtype=RECORD)
+        self.state = "splash"
+        self.high_score = 0
+        self.enemy_count = 0
+        self.level = 1
+        self.player = PlayerStatus()
+        self.ghosts = {}
+        self.make_ghosts = True
+
+    def apply(self, body):
+        sequence, base, state, score, high_score, enemy_count, lives, level, multishot, bombs, \
+            removed_count, changed_count = HEADER.unpack_from(body)
+        if base != FULL and base != self.sequence:
+            raise ValueError("snapshot diffed against {} but the mirror is at {}".format(base, self.sequence))
+        removed = np.frombuffer(body, dtype="<u4", count=removed_count, offset=HEADER.size)
+        changed = np.frombuffer(body, dtype=RECORD, count=changed_count, offset=HEADER.size + removed.nbytes)
+
+        if base == FULL:
+            gone = self.records["id"]
+            self.records = changed.copy()
+        else:
+            gone = removed
+            keep = ~np.isin(self.records["id"], np.concatenate((removed, changed["id"])))
+            records = np.concatenate((self.records[keep], changed))
+            self.records = records[np.argsort(records["id"], kind="stable")]
+        self.sequence = sequence
+        self.state = STATES[state]
+        self.high_score = high_score
+        self.enemy_count = enemy_count
+        self.level = level
+        self.player.score = score
+        self.player.lives = lives
+        self.player.multishot = multishot
+        self.player.bombs = bombs
+
+        if self.make_ghosts:
+            for key in gone.tolist():
+                self.ghosts.pop(key, None)
+            for record in changed.tolist():
+                self.update_ghost(*record)
+
+    def update_ghost(self, key, kind, x, y, heading, value, size):
+        name, shape, color = LOOKS[kind]
+        ghost = self.ghosts.get(key)
+        if ghost is None or ghost.shape != shape or ghost.color != color:
+            cls = getattr(arena, name)
+            ghost = cls.__new__(cls)
+            ghost.game = None
+            ghost.shape = shape
+            ghost.color = color
+            ghost.state = ACTIVE
+            ghost.dx = 0.0
+            ghost.dy = 0.0
+            ghost.thrust = 0.0
+            self.ghosts[key] = ghost
+        ghost.x = x / POSITION_SCALE
+        ghost.y = y / POSITION_SCALE
+        ghost.heading = heading * (360 / 256)
+        if isinstance(ghost, Explosion):
+            ghost.time = value
+            ghost.width = ghost.height = size
+        else:
+            ghost.health = value / 255 * ghost.max_health
+        if isinstance(ghost, Player):
+            ghost.thrust = size / 255
+
+    def player_position(self):
+        ghost = self.ghosts.get(PLAYER_ID)
+        if ghost is None:
+            return 0.0, 0.0
+        return ghost.x, ghost.y
+
+    def render(self, pen, camera):
+        # Sprites as Game.render draws them, explosions on top
+        explosions = []
+        for ghost in self.ghosts.values():
+            if isinstance(ghost, Explosion):
+                explosions.append(ghost)
+            else:
+                ghost.render(pen, camera.x, camera.y)
+        pen.flush()
+        for ghost in explosions:
+            ghost.render(pen, camera.x, camera.y)
+        Game.render_border(self, pen, camera.x, camera.y)
@@ -0,0 +1,60 @@
+# Space Arena object pools
+# Sprites that come and go (missiles, bombs, explosions) are recycled
+# through a free list instead of being searched for or allocated on
+# demand, so acquiring and releasing one is O(1).
+from world import EntityList
+
+
+class Pool:
+    def __init__(self, factory, size=0, max_size=None):
+        self.factory = factory
+        self.max_size = max_size
+        self.items = []
+        self.free = []
+        self.in_use = EntityList()
+        self.high_water = 0
+        self.hits = 0
+        self.misses = 0
+        self.allocations = 0
+        for _ in range(size):
+            self.free.append(self.allocate())
+
+    def __iter__(self):
+        # Every item the pool owns, in use or not
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def allocate(self):
+        item = self.factory()
+        self.items.append(item)
+        self.allocations += 1
+        return item
+
+    def acquire(self):
+        # A free item, a new one, or None once max_size items are in use
+        if self.free:
+            self.hits += 1
+            item = self.free.pop()
+        else:
+            self.misses += 1
+            if self.max_size is not None and len(self.items) >= self.max_size:
+                return None
+            item = self.allocate()
+        self.in_use.add(item)
+        if len(self.in_use) > self.high_water:
+            self.high_water = len(self.in_use)
+        return item
+
+    def release(self, item):
+        self.in_use.remove(item)
+        self.free.append(item)
+
+    def active(self):
+        # Snapshot of the items in use, safe to release from while looping
+        return list(self.in_use)
+
+    def stats(self):
+        return "in use {}, high water {}, hits {}, misses {}, allocations {}".format(
+            len(self.in_use), self.high_water, self.hits, self.misses, self.allocations)
@@ -0,0 +1,134 @@
+# Space Arena frame profiler
+# Named timing scopes around each phase of a frame. Time spent in a phase
+# is totalled per frame (a phase can run more than once when several ticks
+# fall in one frame) and the last `window` frames of each phase are kept,
+# so the percentiles show which phase a stutter came from. With tracing on,
+# every scope is also kept as a Chrome/Perfetto trace event.
+import json
+import time
+from collections import deque
+import numpy as np
+
+
+class Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+
+class Profiler:
+    def __init__(self, window=500, trace=False, max_trace_events=200000):
+        self.window = window
+        self.scopes = {}
+        self.samples = {}
+        self.filled = {}
+        self.frame = {}
+        self.frames = 0
+        self.frame_start = None
+        self.origin = time.perf_counter()
+
+        # Most recent scopes as (name, start, end), oldest dropped first
+        self.trace = deque(maxlen=max_trace_events) if trace else None
+
+    def phase(self, name):
+        # Context manager timing one run of the phase called name
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = Scope(self, name)
+            self.samples[name] = np.zeros(self.window)
+            self.filled[name] = 0
+        return scope
+
+    def record(self, name, start, end):
+        self.frame[name] = self.frame.get(name, 0.0) + end - start
+        if self.trace is not None:
+            self.trace.append((name, start, end))
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if self.frame_start is not None:
+            self.phase("frame")
+            self.record("frame", self.frame_start, time.perf_counter())
+
+        # One sample per phase per frame, zero if it didn't run
+        i = self.frames % self.window
+        for name, samples in self.samples.items():
+            samples[i] = self.frame.get(name, 0.0)
+            if self.filled[name] < self.window:
+                self.filled[name] += 1
+        self.frame.clear()
+        self.frames += 1
+
+    def percentiles(self, name):
+        # p50, p95, p99 and max of the phase in seconds, over the window
+        samples = self.samples[name]
+        if self.filled[name] < self.window:
+            samples = samples[:self.filled[name]]
+        if len(samples) == 0:
+            return 0.0, 0.0, 0.0, 0.0
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return p50, p95, p99, samples.max()
+
+    def summary(self):
+        # Mean and percentiles of each phase in ms, over the window
+        phases = {}
+        for name in self.samples:
+            p50, p95, p99, highest = self.percentiles(name)
+            samples = self.samples[name][:self.filled[name]]
+            mean = samples.mean() if len(samples) else 0.0
+            phases[name] = {"mean": mean * 1000, "p50": p50 * 1000, "p95": p95 * 1000,
+                            "p99": p99 * 1000, "max": highest * 1000}
+        return phases
+
+    def print_stats(self):
+        print("{:18}{:>9}{:>9}{:>9}{:>9}  (ms, last {} frames)".format(
+            "Phase", "p50", "p95", "p99", "max", min(self.frames, self.window)))
+        for name in self.samples:
+            p50, p95, p99, highest = self.percentiles(name)
+            print("{:18}{:9.3f}{:9.3f}{:9.3f}{:9.3f}".format(
+                name, p50 * 1000, p95 * 1000, p99 * 1000, highest * 1000))
+
+    def save_trace(self, filename):
+        # Complete ("X") events with microsecond timestamps
+        events = []
+        for name, start, end in self.trace:
+            events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (start - self.origin) * 1000000,
+                           "dur": (end - start) * 1000000})
+        trace_file = open(filename, "w")
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        trace_file.close()
+
+
+class NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullProfiler:
+    # Profiler that records nothing
+    scope = NullScope()
+
+    def phase(self, name):
+        return NullProfiler.scope
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
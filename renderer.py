@@ -0,0 +1,285 @@
+# Space Arena render backends
+# Anything that draws takes a turtle-like "pen". The real game hands in a
+# turtle.Turtle; headless worlds hand in a NullPen, which accepts the same
+# calls and draws nothing. StatePen sits in front of a real turtle and
+# drops the calls that would not change anything.
+import math
+
+
+class NullPen:
+    def goto(self, x, y=None):
+        pass
+
+    def setheading(self, heading):
+        pass
+
+    def shape(self, name=None):
+        pass
+
+    def color(self, *args):
+        pass
+
+    def shapesize(self, stretch_wid=None, stretch_len=None, outline=None):
+        pass
+
+    def width(self, width=None):
+        pass
+
+    def stamp(self):
+        pass
+
+    def fd(self, distance):
+        pass
+
+    def circle(self, radius):
+        pass
+
+    def penup(self):
+        pass
+
+    def pendown(self):
+        pass
+
+    def clear(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+class StatePen:
+    # Wraps a turtle and only passes on calls that change what it draws.
+    # It remembers the pen state it has already applied (position, heading,
+    # shape, color, size, width) and skips calls that would set the same
+    # value again; moves with the pen up are held back until something
+    # needs the turtle to be there. Between begin_batch and end_batch,
+    # stamps are queued and then issued sorted by shape, color and size so
+    # the turtle switches state as rarely as possible. If shapes is given,
+    # shapes.ensure(name) is called before a shape is first put on the turtle.
+    def __init__(self, turtle, shapes=None):
+        self.turtle = turtle
+        self.shapes = shapes
+
+        # Wanted state
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.shape_name = None
+        self.pen_color = None
+        self.stretch = None
+        self.pen_width = None
+        self.down = False
+
+        # State the turtle actually has (None when unknown)
+        self.applied_position = None
+        self.applied_heading = None
+        self.applied_shape = None
+        self.applied_color = None
+        self.applied_stretch = None
+        self.applied_width = None
+        self.applied_down = None
+
+        self.batching = False
+        self.stamps = []
+
+        # Call counts
+        self.calls = 0
+        self.skipped = 0
+        self.frame_calls = 0
+        self.frame_skipped = 0
+        self.last_frame_calls = 0
+        self.last_frame_skipped = 0
+        self.max_frame_calls = 0
+
+    def call(self, name, *args):
+        self.calls += 1
+        self.frame_calls += 1
+        return getattr(self.turtle, name)(*args)
+
+    def skip(self):
+        self.skipped += 1
+        self.frame_skipped += 1
+
+    # Per-frame counters
+    def begin_frame(self):
+        self.frame_calls = 0
+        self.frame_skipped = 0
+
+    def end_frame(self):
+        self.last_frame_calls = self.frame_calls
+        self.last_frame_skipped = self.frame_skipped
+        if self.frame_calls > self.max_frame_calls:
+            self.max_frame_calls = self.frame_calls
+
+    def stats(self):
+        return "last frame {} ({} skipped), max frame {}, total {} ({} skipped)".format(
+            self.last_frame_calls, self.last_frame_skipped, self.max_frame_calls, self.calls, self.skipped)
+
+    # Bring the turtle in line with the wanted state
+    def apply_position(self):
+        position = (self.x, self.y)
+        if self.applied_position != position:
+            self.call("goto", self.x, self.y)
+            self.applied_position = position
+
+    def apply_heading(self):
+        if self.applied_heading != self.heading:
+            self.call("setheading", self.heading)
+            self.applied_heading = self.heading
+
+    def apply_shape(self):
+        if self.shape_name is not None and self.applied_shape != self.shape_name:
+            if self.shapes is not None:
+                self.shapes.ensure(self.shape_name)
+            self.call("shape", self.shape_name)
+            self.applied_shape = self.shape_name
+
+    def apply_color(self):
+        if self.pen_color is not None and self.applied_color != self.pen_color:
+            self.call("color", *self.pen_color)
+            self.applied_color = self.pen_color
+
+    def apply_stretch(self):
+        if self.stretch is not None and self.applied_stretch != self.stretch:
+            self.call("shapesize", self.stretch[0], self.stretch[1], None)
+            self.applied_stretch = self.stretch
+
+    def apply_width(self):
+        if self.pen_width is not None and self.applied_width != self.pen_width:
+            self.call("width", self.pen_width)
+            self.applied_width = self.pen_width
+
+    def apply_down(self):
+        if self.applied_down != self.down:
+            self.call("pendown" if self.down else "penup")
+            self.applied_down = self.down
+
+    # Turtle interface
+    def goto(self, x, y=None):
+        if y is None:
+            x, y = x
+        self.x = x
+        self.y = y
+        if self.down:
+            self.apply_color()
+            self.apply_width()
+            self.call("goto", x, y)
+            self.applied_position = (x, y)
+        else:
+            self.skip()
+
+    def fd(self, distance):
+        radians = math.radians(self.heading)
+        self.goto(self.x + distance * math.cos(radians), self.y + distance * math.sin(radians))
+
+    def setheading(self, heading):
+        self.heading = heading
+        self.skip()
+
+    def shape(self, name=None):
+        self.shape_name = name
+        self.skip()
+
+    def color(self, *args):
+        self.pen_color = args
+        self.skip()
+
+    def shapesize(self, stretch_wid=None, stretch_len=None, outline=None):
+        self.stretch = (stretch_wid, stretch_len)
+        self.skip()
+
+    def width(self, width=None):
+        self.pen_width = width
+        self.skip()
+
+    def penup(self):
+        self.down = False
+        self.apply_down()
+
+    def pendown(self):
+        if self.applied_down:
+            self.down = True
+            self.skip()
+            return
+        # Get to the start of the line before putting the pen down
+        self.down = False
+        self.apply_down()
+        self.apply_position()
+        self.down = True
+        self.apply_down()
+
+    def stamp(self):
+        if self.batching:
+            self.stamps.append((self.shape_name, self.pen_color, self.stretch, self.heading, self.x, self.y))
+            self.skip()
+        else:
+            self.apply_stamp_state()
+            self.call("stamp")
+
+    def apply_stamp_state(self):
+        self.apply_position()
+        self.apply_heading()
+        self.apply_shape()
+        self.apply_color()
+        self.apply_stretch()
+
+    def circle(self, radius):
+        self.apply_position()
+        self.apply_heading()
+        self.apply_color()
+        self.apply_width()
+        self.apply_down()
+        self.call("circle", radius)
+        # Where the turtle ends up after a full circle is only nearly known
+        self.applied_position = None
+        self.applied_heading = None
+
+    def clear(self):
+        self.call("clear")
+
+    # Batching
+    def begin_batch(self):
+        self.batching = True
+
+    def flush(self):
+        if not self.stamps:
+            return
+        stamps = self.stamps
+        self.stamps = []
+        stamps.sort(key=stamp_key)
+        wanted = (self.shape_name, self.pen_color, self.stretch, self.heading, self.x, self.y)
+        for stamp in stamps:
+            self.shape_name, self.pen_color, self.stretch, self.heading, self.x, self.y = stamp
+            self.apply_stamp_state()
+            self.call("stamp")
+        self.shape_name, self.pen_color, self.stretch, self.heading, self.x, self.y = wanted
+
+    def end_batch(self):
+        self.flush()
+        self.batching = False
+
+
+def stamp_key(stamp):
+    shape, color, stretch = stamp[:3]
+    return str(shape), str(color), stretch or (1.0, 1.0)
+
+
+class CanvasLayer:
+    # Tags the canvas items drawn between begin and end so that lift can
+    # raise the whole group above newer items in a single call
+    def __init__(self, canvas, tag):
+        self.canvas = canvas
+        self.tag = tag
+        self.before = None
+
+    def begin(self):
+        self.before = set(self.canvas.find_all())
+
+    def end(self):
+        for item in self.canvas.find_all():
+            if item not in self.before:
+                self.canvas.addtag_withtag(self.tag, item)
+        self.before = None
+
+    def lift(self):
+        self.canvas.tag_raise(self.tag)
@@ -0,0 +1,155 @@
+# Space Arena scores
+# The game only tells the ScoreKeeper the latest score; a background thread
+# wakes every `interval` seconds and, if it changed, adds it to the
+# session's history in a SQLite leaderboard and rewrites the high score
+# file (atomically, so a crash never leaves it half written). The high
+# score file stays as a tiny cache so startup doesn't need the database.
+import os
+import time
+import sqlite3
+import threading
+
+
+class ScoreStore:
+    # One row per game played, plus its score as it went up
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                started REAL NOT NULL,
+                ended REAL,
+                seed INTEGER,
+                score INTEGER NOT NULL DEFAULT 0,
+                level INTEGER NOT NULL DEFAULT 1);
+            CREATE INDEX IF NOT EXISTS sessions_by_score ON sessions (score DESC);
+            CREATE TABLE IF NOT EXISTS history (
+                session INTEGER NOT NULL REFERENCES sessions (id),
+                time REAL NOT NULL,
+                score INTEGER NOT NULL,
+                level INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS history_by_session ON history (session, time);
+        """)
+
+    def start_session(self, seed=None):
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO sessions (started, seed) VALUES (?, ?)", (time.time(), seed))
+        return cursor.lastrowid
+
+    def record(self, session, score, level):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO history (session, time, score, level) VALUES (?, ?, ?, ?)",
+                (session, time.time(), score, level))
+            self.connection.execute(
+                "UPDATE sessions SET score = ?, level = ? WHERE id = ?", (score, level, session))
+
+    def end_session(self, session):
+        with self.connection:
+            self.connection.execute("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), session))
+
+    def best(self):
+        row = self.connection.execute("SELECT MAX(score) FROM sessions").fetchone()
+        return row[0] or 0
+
+    def top(self, n=10):
+        # (score, level, started) of the n best games
+        return self.connection.execute(
+            "SELECT score, level, started FROM sessions ORDER BY score DESC LIMIT ?", (n,)).fetchall()
+
+    def history(self, session):
+        # (time, score, level) of the session, oldest first
+        return self.connection.execute(
+            "SELECT time, score, level FROM history WHERE session = ? ORDER BY time", (session,)).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+def write_atomic(filename, text):
+    # Write a temporary file and rename it over the old one
+    temp_filename = filename + ".tmp"
+    temp_file = open(temp_filename, "w")
+    temp_file.write(text)
+    temp_file.flush()
+    os.fsync(temp_file.fileno())
+    temp_file.close()
+    os.replace(temp_filename, filename)
+
+
+def read_high_score(filename):
+    # The cached high score, or None if there isn't a readable one
+    try:
+        hs_file = open(filename, "r")
+    except OSError:
+        return None
+    try:
+        return int(hs_file.read())
+    except ValueError:
+        return None
+    finally:
+        hs_file.close()
+
+
+class ScoreKeeper:
+    def __init__(self, high_score_file="highscore.txt", database_file="scores.db", interval=1.0):
+        self.high_score_file = high_score_file
+        self.database_file = database_file
+        self.interval = interval
+
+        # Seed the high score from the file, only asking the database when
+        # the file is missing or damaged
+        high_score = read_high_score(high_score_file)
+        if high_score is None:
+            store = ScoreStore(database_file)
+            high_score = store.best()
+            store.close()
+        self.high_score = high_score
+
+        # Latest (score, level), replaced whole so the writer never sees half an update
+        self.latest = None
+        self.session = None
+        self.flushes = 0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self, seed=None):
+        self.thread = threading.Thread(target=self.run, args=(seed,), daemon=True)
+        self.thread.start()
+
+    def update(self, score, level):
+        # Called from the game loop: never touches the disk
+        self.latest = (score, level)
+
+    def run(self, seed):
+        # SQLite connections belong to the thread that opened them
+        store = ScoreStore(self.database_file)
+        self.session = store.start_session(seed)
+        written = None
+        while True:
+            stopping = self.stopping.wait(self.interval)
+            latest = self.latest
+            if latest is not None and latest != written:
+                store.record(self.session, latest[0], latest[1])
+                if latest[0] > self.high_score:
+                    self.high_score = latest[0]
+                    write_atomic(self.high_score_file, str(self.high_score))
+                written = latest
+                self.flushes += 1
+            if stopping:
+                store.end_session(self.session)
+                store.close()
+                return
+
+    def close(self):
+        # Flush whatever is left and stop the writer
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def top(self, n=10):
+        store = ScoreStore(self.database_file)
+        scores = store.top(n)
+        store.close()
+        return scores
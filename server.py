@@ -0,0 +1,292 @@
+# Space Arena server
+# Hosts any number of independent arenas in one asyncio process. Each arena
+# is a Game ticking at a fixed rate (the same FixedStepClock the window
+# uses, so a slow tick is caught up on and a long stall dropped) and
+# sending a snapshot to its clients every few ticks (see netcode.py). The
+# first client to join an arena flies its ship and everyone after that
+# watches. An arena starts when someone joins it and closes when the last
+# client leaves.
+#
+#   python server.py                       serve on port 5230
+#   python server.py --stats-every 5       print per-arena metrics every 5 seconds
+#
+# Clients send JSON messages:
+#
+#   {"join": "arena name", "watch": false}   join (or start) an arena
+#   {"commands": ["rotate_left", "fire"]}    key commands, for the next tick
+#   {"new_game": true}                       start over after game over
+#   {"stats": true}                          reply with the per-arena metrics
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+import numpy as np
+from arena import *
+from clock import FixedStepClock
+from controls import Controls, COMMANDS
+import netcode
+
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.arena = None
+        self.controlling = False
+
+        # Sequence number of the last snapshot sent (None to send the
+        # next one in full)
+        self.base = None
+
+    def send(self, data):
+        self.writer.write(data)
+
+    def buffered(self):
+        return self.writer.transport.get_write_buffer_size()
+
+
+class Arena:
+    def __init__(self, name, width=2000, height=2000, snapshot_rate=30, history=8,
+                 max_buffer=256 * 1024):
+        if max(width, height) > netcode.MAX_ARENA_SIZE:
+            raise ValueError("arenas can be at most {} across".format(netcode.MAX_ARENA_SIZE))
+        self.name = name
+        self.width = width
+        self.height = height
+        self.clock = FixedStepClock(render_rate=None, max_steps=5)
+        self.snapshot_every = max(1, round(TICK_RATE / snapshot_rate))
+        self.clients = []
+
+        # Snapshots kept to diff against, oldest first, for clients that
+        # missed some; a client whose last one is older is sent the lot
+        self.history_size = history
+        self.history = {}
+        self.sequence = 0
+
+        # A client with more than max_buffer bytes still to send skips
+        # snapshots until it catches up
+        self.max_buffer = max_buffer
+
+        # Metrics
+        self.started = time.perf_counter()
+        self.steps = 0
+        self.ticks = 0
+        self.tick_times = deque(maxlen=1000)
+        self.snapshot_times = deque(maxlen=1000)
+        self.snapshots = 0
+        self.full_snapshots = 0
+        self.skipped = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+        self.new_game()
+
+    def new_game(self, seed=None):
+        game = Game(self.width, self.height, seed=seed)
+        game.start_level()
+        game.start()
+        self.game = game
+        self.controls = Controls(game)
+        self.ids = {}
+        self.history.clear()
+        for client in self.clients:
+            client.base = None
+
+    def join(self, client, watch=False):
+        client.arena = self
+        client.controlling = not watch and not any(other.controlling for other in self.clients)
+        client.base = None
+        self.clients.append(client)
+        client.send(netcode.json_message({"arena": self.name, "width": self.width, "height": self.height,
+                                          "controlling": client.controlling}))
+
+    def leave(self, client):
+        self.clients.remove(client)
+        client.arena = None
+        client.controlling = False
+
+    def command(self, client, names):
+        # Queue the controlling client's commands for the next tick
+        if client.controlling:
+            for name in names:
+                if name in COMMANDS:
+                    self.controls.pending.append(name)
+
+    async def run(self):
+        # Tick until everyone has left
+        while self.clients:
+            for _ in range(self.clock.advance()):
+                if self.game.state == "playing":
+                    start = time.perf_counter()
+                    self.controls.apply()
+                    self.game.update()
+                    self.tick_times.append(time.perf_counter() - start)
+                    self.ticks += 1
+                self.steps += 1
+                if self.steps % self.snapshot_every == 0:
+                    self.broadcast()
+            await asyncio.sleep(max(self.clock.tick_time - self.clock.accumulator, 0))
+
+    def broadcast(self):
+        start = time.perf_counter()
+        self.sequence += 1
+        records = netcode.capture(self.game, self.ids)
+        self.history[self.sequence] = records
+        if len(self.history) > self.history_size:
+            del self.history[next(iter(self.history))]
+
+        # Clients sent the same snapshot last time get the same message
+        messages = {}
+        for client in self.clients:
+            if client.buffered() > self.max_buffer:
+                self.skipped += 1
+                continue
+            base = client.base
+            if base not in self.history:
+                base = None
+            data = messages.get(base)
+            if data is None:
+                if base is None:
+                    removed = np.zeros(0, dtype="<u4")
+                    changed = records
+                else:
+                    removed, changed = netcode.diff(self.history[base], records)
+                data = messages[base] = netcode.snapshot_message(self.sequence, base, self.game, removed, changed)
+            if base is None:
+                self.full_snapshots += 1
+            client.send(data)
+            client.base = self.sequence
+            self.snapshots += 1
+            self.bytes_sent += len(data)
+        self.snapshot_times.append(time.perf_counter() - start)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        tick_times = np.array(self.tick_times) * 1000
+        if len(tick_times) == 0:
+            tick_times = np.zeros(1)
+        snapshot_times = np.array(self.snapshot_times) * 1000
+        if len(snapshot_times) == 0:
+            snapshot_times = np.zeros(1)
+        return {"arena": self.name,
+                "clients": len(self.clients),
+                "level": self.game.level,
+                "enemies": self.game.enemy_count,
+                "seconds": elapsed,
+                "ticks": self.ticks,
+                "dropped_ticks": self.clock.dropped_ticks,
+                "tick_ms": {"mean": tick_times.mean(), "p50": np.percentile(tick_times, 50),
+                            "p99": np.percentile(tick_times, 99), "max": tick_times.max()},
+                "snapshot_ms": {"mean": snapshot_times.mean(), "p99": np.percentile(snapshot_times, 99)},
+                "snapshots": self.snapshots,
+                "full_snapshots": self.full_snapshots,
+                "skipped_snapshots": self.skipped,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "kb_per_second_out": self.bytes_sent / elapsed / 1024,
+                "kb_per_second_in": self.bytes_received / elapsed / 1024,
+                "bytes_per_snapshot": self.bytes_sent / max(self.snapshots, 1)}
+
+
+def print_arena_stats(arenas):
+    print("{:12}{:>8}{:>6}{:>8}{:>9}{:>9}{:>8}{:>10}{:>9}{:>9}{:>8}".format(
+        "Arena", "clients", "level", "enemies", "tick p50", "tick p99", "dropped", "snapshots",
+        "KB/s out", "B/snap", "skipped"))
+    for stats in arenas:
+        print("{:12}{:8}{:6}{:8}{:7.3f}ms{:7.3f}ms{:8}{:10}{:9.1f}{:9.0f}{:8}".format(
+            stats["arena"][:12], stats["clients"], stats["level"], stats["enemies"], stats["tick_ms"]["p50"],
+            stats["tick_ms"]["p99"], stats["dropped_ticks"], stats["snapshots"], stats["kb_per_second_out"],
+            stats["bytes_per_snapshot"], stats["skipped_snapshots"]))
+
+
+class Server:
+    def __init__(self, arena_options=None):
+        self.arena_options = arena_options or {}
+        self.arenas = {}
+        self.closed = []
+
+    def arena(self, name):
+        # The arena called name, started if it isn't running
+        arena = self.arenas.get(name)
+        if arena is None:
+            arena = self.arenas[name] = Arena(name, **self.arena_options)
+            asyncio.ensure_future(self.run_arena(arena))
+        return arena
+
+    async def run_arena(self, arena):
+        await arena.run()
+        del self.arenas[arena.name]
+        self.closed.append(arena.stats())
+
+    def stats(self):
+        return [arena.stats() for arena in self.arenas.values()]
+
+    async def handle(self, reader, writer):
+        client = Connection(writer)
+        try:
+            while True:
+                kind, body = await netcode.read_message(reader)
+                if client.arena is not None:
+                    client.arena.bytes_received += len(body) + netcode.LENGTH.size + 1
+                if kind != netcode.JSON:
+                    continue
+                # Anything but a JSON object is bad input, like a broken
+                # message, and drops the client
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("request is not a JSON object")
+                if "join" in request:
+                    if client.arena is not None:
+                        client.arena.leave(client)
+                    self.arena(str(request["join"])).join(client, request.get("watch", False))
+                if "commands" in request and client.arena is not None:
+                    client.arena.command(client, request["commands"])
+                if request.get("new_game") and client.controlling and client.arena.game.state == "game over":
+                    client.arena.new_game()
+                if request.get("stats"):
+                    client.send(netcode.json_message({"arenas": self.stats(), "closed": self.closed}))
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError, ValueError, KeyError,
+                TypeError):
+            pass
+        finally:
+            if client.arena is not None:
+                client.arena.leave(client)
+            writer.close()
+
+    async def report(self, every):
+        while True:
+            await asyncio.sleep(every)
+            if self.arenas:
+                print_arena_stats(self.stats())
+
+    async def serve(self, host, port, stats_every=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        print("Listening on {}:{}".format(*server.sockets[0].getsockname()[:2]), flush=True)
+        if stats_every:
+            asyncio.ensure_future(self.report(stats_every))
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Host Space Arena games over the network.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5230)
+    parser.add_argument("--size", type=int, default=2000, help="arena width and height")
+    parser.add_argument("--snapshot-rate", type=int, default=30, help="snapshots sent a second")
+    parser.add_argument("--stats-every", type=float, metavar="SECONDS", help="print per-arena metrics this often")
+    args = parser.parse_args(argv)
+    if not 0 < args.size <= netcode.MAX_ARENA_SIZE or args.size % 2:
+        parser.error("--size must be an even number up to {}".format(netcode.MAX_ARENA_SIZE))
+
+    server = Server({"width": args.size, "height": args.size, "snapshot_rate": args.snapshot_rate})
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.stats_every))
+    except KeyboardInterrupt:
+        print_arena_stats(server.stats() + server.closed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,92 @@
+# Space Arena spatial hash
+# A uniform grid over the arena. Each sprite lives in the bucket for the
+# cell its centre is in, so a query only has to look at the handful of
+# cells that overlap the area of interest instead of every sprite.
+
+
+class SpatialHash:
+    def __init__(self, width, height, cell_size=100):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.cells = {}
+        self.sprite_cells = {}
+        self.order = {}
+        self.next_order = 0
+        # Largest half width/height of anything inserted, so AABB queries
+        # can widen their search to catch sprites straddling a cell edge
+        self.max_half_size = 0
+
+    def cell_for(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def clear(self):
+        self.cells.clear()
+        self.sprite_cells.clear()
+        self.order.clear()
+        self.next_order = 0
+        self.max_half_size = 0
+
+    def insert(self, sprite):
+        cell = self.cell_for(sprite.x, sprite.y)
+        self.cells.setdefault(cell, {})[sprite] = None
+        self.sprite_cells[sprite] = cell
+        self.order[sprite] = self.next_order
+        self.next_order += 1
+        half_size = max(sprite.width, sprite.height) / 2
+        if half_size > self.max_half_size:
+            self.max_half_size = half_size
+
+    def remove(self, sprite):
+        cell = self.sprite_cells.pop(sprite, None)
+        if cell is None:
+            return
+        del self.order[sprite]
+        bucket = self.cells[cell]
+        del bucket[sprite]
+        if not bucket:
+            del self.cells[cell]
+
+    def move(self, sprite):
+        old_cell = self.sprite_cells[sprite]
+        cell = self.cell_for(sprite.x, sprite.y)
+        if cell != old_cell:
+            bucket = self.cells[old_cell]
+            del bucket[sprite]
+            if not bucket:
+                del self.cells[old_cell]
+            self.cells.setdefault(cell, {})[sprite] = None
+            self.sprite_cells[sprite] = cell
+
+    def candidates(self, left, bottom, right, top):
+        # Everything bucketed in cells overlapping the box, in insertion order
+        min_col, min_row = self.cell_for(left, bottom)
+        max_col, max_row = self.cell_for(right, top)
+        found = []
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                bucket = self.cells.get((col, row))
+                if bucket:
+                    found.extend(bucket)
+        found.sort(key=self.order.__getitem__)
+        return found
+
+    def query_range(self, x, y, range):
+        # Sprites whose centre is strictly within range of (x, y) on both axes
+        found = []
+        for sprite in self.candidates(x - range, y - range, x + range, y + range):
+            if abs(x - sprite.x) < range and abs(y - sprite.y) < range:
+                found.append(sprite)
+        return found
+
+    def query_aabb(self, left, bottom, right, top):
+        # Sprites whose bounding box overlaps the box
+        pad = self.max_half_size
+        found = []
+        for sprite in self.candidates(left - pad, bottom - pad, right + pad, top + pad):
+            if sprite.x - sprite.width / 2 < right and \
+                    sprite.x + sprite.width / 2 > left and \
+                    sprite.y - sprite.height / 2 < top and \
+                    sprite.y + sprite.height / 2 > bottom:
+                found.append(sprite)
+        return found
@@ -0,0 +1,7 @@
+# Space Arena sprite states
+# Sprites keep their state as a small integer so the per-frame loops
+# compare ints rather than strings, and the swarm can store it in an array.
+ACTIVE = 0
+READY = 1
+INACTIVE = 2
+EXPLODING = 3
@@ -0,0 +1,322 @@
+# Space Arena enemy swarm
+# Enemy state lives in parallel NumPy arrays (one slot per enemy) so the
+# whole swarm can be moved, steered and clamped in a handful of array
+# operations per frame. Enemy objects are thin views onto their slot, and
+# a destroyed enemy's slot is refilled with the last one.
+#
+# Enemies far from the player get their AI updated less often (level of
+# detail). Every enemy drifts by its velocity every tick, but the rest of
+# the update (steering, bouncing off the walls, the speed limit) runs every
+# tick only for enemies near the player and every few ticks for the rest,
+# at a phase of their own so the work is spread out. An enemy is never
+# left longer than it would take, at full speed both ways, to get within
+# steering range of the player on either axis (hunters and surveillance
+# droids steer on each axis separately), into view or to a wall, so
+# everything moves exactly as it did at full rate. A hunter's 75% chance of
+# steering each tick comes from a hash of the game seed, the hunter and the
+# tick rather than the game's random stream, so skipping far hunters
+# doesn't change anything else.
+import math
+import numpy as np
+from states import ACTIVE
+
+HUNTER = 0
+MINE = 1
+SURVEILLANCE = 2
+TYPE_CODES = {"hunter": HUNTER, "mine": MINE, "surveillance": SURVEILLANCE}
+
+
+def swarm_property(name):
+    # Attribute stored in the swarm array called name, at the enemy's slot
+    def get(self):
+        return getattr(self.swarm, name)[self.index].item()
+
+    def set(self, value):
+        getattr(self.swarm, name)[self.index] = value
+
+    return property(get, set)
+
+
+class EnemySwarm:
+    FLOAT_FIELDS = ("x", "y", "dx", "dy", "heading", "da", "thrust", "health")
+    INT_FIELDS = ("type", "state", "col", "row", "serial", "tier", "next")
+
+    def __init__(self, width, height, max_dx, max_dy, rng, capacity=64):
+        self.width = width
+        self.height = height
+        self.max_dx = max_dx
+        self.max_dy = max_dy
+        # Fastest an enemy can move along either axis
+        self.max_speed = max(max_dx, max_dy)
+        self.seed = rng.getrandbits(64)
+        self.serials = 0
+        self.hunter_range = 200
+        self.surveillance_range = 100
+        self.steer = 0.05
+
+        # AI level of detail: distances (along either axis) where the mid
+        # and far tiers start, and at most how many ticks apart each tier
+        # updates (the mid tier starts outside the view). Near enemies are
+        # only re-tiered every recheck ticks. In an arena not much bigger
+        # than the far range nearly every enemy is in view or steering
+        # range of the player anyway, so the bookkeeping costs more than it
+        # saves and it starts off.
+        self.tier_ranges = (700, 1200)
+        self.tier_periods = (1, 4, 16)
+        self.recheck = 8
+        self.lod = max(width, height) > 2 * self.tier_ranges[1]
+        self.tick = 0
+        self.updates = 0
+        self.skipped = 0
+
+        self.capacity = 0
+        self.count = 0
+        self.enemies = []
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        for name in EnemySwarm.FLOAT_FIELDS:
+            array = np.zeros(capacity, dtype=np.float64)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        for name in EnemySwarm.INT_FIELDS:
+            array = np.zeros(capacity, dtype=np.int64)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def slot_size(self):
+        # Bytes each enemy takes up across all the arrays
+        size = 0
+        for name in EnemySwarm.FLOAT_FIELDS + EnemySwarm.INT_FIELDS:
+            size += getattr(self, name).itemsize
+        return size
+
+    def clear(self):
+        self.count = 0
+        self.enemies.clear()
+
+    def add(self, enemy, type):
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+        index = self.count
+        self.type[index] = TYPE_CODES[type]
+        self.state[index] = ACTIVE
+        self.serial[index] = self.serials
+        self.serials += 1
+        self.tier[index] = 0
+        self.next[index] = self.tick + 1
+        self.enemies.append(enemy)
+        self.count += 1
+        return index
+
+    def remove(self, enemy):
+        # Move the last enemy into the freed slot
+        i = enemy.index
+        last = self.count - 1
+        if i != last:
+            for name in EnemySwarm.FLOAT_FIELDS + EnemySwarm.INT_FIELDS:
+                array = getattr(self, name)
+                array[i] = array[last]
+            moved = self.enemies[last]
+            moved.index = i
+            self.enemies[i] = moved
+        self.enemies.pop()
+        self.count -= 1
+
+    def update(self, player):
+        self.tick += 1
+        n = self.count
+        if n == 0:
+            return
+        dx = self.dx
+        dy = self.dy
+        live = self.state[:n] == ACTIVE
+        active = np.flatnonzero(live)
+        if len(active) == 0:
+            return
+
+        self.drift(n, live)
+        if self.lod:
+            waiting = self.next[:n] <= self.tick
+            due = np.flatnonzero(live & (waiting | (self.tier[:n] == 0)))
+        else:
+            due = active
+        self.updates += len(due)
+        self.skipped += len(active) - len(due)
+        self.border_check(due)
+
+        # Code for different types
+        types = self.type[due]
+        hunters = due[types == HUNTER]
+        if len(hunters):
+            hunters = hunters[self.coins(hunters) < 0.75]
+            self.steer_towards(hunters, player.x, player.y, self.hunter_range, self.steer)
+
+        watchers = due[types == SURVEILLANCE]
+        if len(watchers):
+            self.steer_towards(watchers, player.x, player.y, self.surveillance_range, -self.steer)
+
+        # Set max speed
+        dx[due] = np.clip(dx[due], -self.max_dx, self.max_dx)
+        dy[due] = np.clip(dy[due], -self.max_dy, self.max_dy)
+        if self.lod:
+            self.schedule(due[waiting[due]], player)
+
+        # Check health last, since destroyed enemies leave the arrays
+        dead = [self.enemies[i] for i in active[self.health[active] <= 0]]
+        for enemy in dead:
+            enemy.reset()
+
+    def drift(self, n, live):
+        # One tick of movement for every live enemy
+        heading = self.heading[:n]
+        np.add(heading, self.da[:n], out=heading, where=live)
+        np.remainder(heading, 360, out=heading, where=live)
+
+        # Thrust integration (enemies never thrust today, so skip the trig)
+        dx = self.dx[:n]
+        dy = self.dy[:n]
+        thrust = self.thrust[:n]
+        if thrust.any():
+            radians = np.radians(heading)
+            np.add(dx, np.cos(radians) * thrust, out=dx, where=live)
+            np.add(dy, np.sin(radians) * thrust, out=dy, where=live)
+
+        np.add(self.x[:n], dx, out=self.x[:n], where=live)
+        np.add(self.y[:n], dy, out=self.y[:n], where=live)
+
+    def border_check(self, indices):
+        # Bounce the enemies at indices off the walls, and stop new mines
+        x = self.x
+        y = self.y
+        dx = self.dx
+        dy = self.dy
+        right = self.width / 2.0 - 10
+        top = self.height / 2.0 - 10
+        ax = x[indices]
+        hit = indices[ax > right]
+        x[hit] = right
+        dx[hit] *= -1
+        hit = indices[ax < -right]
+        x[hit] = -right
+        dx[hit] *= -1
+        ay = y[indices]
+        hit = indices[ay > top]
+        y[hit] = top
+        dy[hit] *= -1
+        hit = indices[ay < -top]
+        y[hit] = -top
+        dy[hit] *= -1
+
+        mines = indices[self.type[indices] == MINE]
+        dx[mines] = 0
+        dy[mines] = 0
+
+    def schedule(self, indices, player):
+        # Pick the tick each enemy at indices is next updated on: the next
+        # one at its phase for its tier's period, or sooner if it could be in
+        # view, steer or reach a wall before then. Until that tick it only
+        # drifts. Enemies that can't skip a tick go in the near tier.
+        x = self.x[indices]
+        y = self.y[indices]
+        across = np.abs(x - player.x)
+        along = np.abs(y - player.y)
+        distance = np.maximum(across, along)
+        tiers = np.add(distance >= self.tier_ranges[0], distance >= self.tier_ranges[1], dtype=np.int64)
+        periods = np.array(self.tier_periods)[tiers]
+        wait = periods - (self.tick + self.serial[indices]) % periods
+
+        # Ticks it can certainly sit out, with it and the player closing
+        # at full speed (mines never steer)
+        ranges = np.array([self.hunter_range, -np.inf, self.surveillance_range])[self.type[indices]]
+        closing = self.max_speed + max(player.max_dx, player.max_dy)
+        safe = np.minimum(distance - self.tier_ranges[0], np.minimum(across, along) - ranges) / closing
+        wall = np.minimum(self.width / 2.0 - 10 - np.abs(x), self.height / 2.0 - 10 - np.abs(y))
+        safe = np.minimum(safe, wall / self.max_speed - 1)
+        skip = np.floor(np.maximum(safe, 0)).astype(np.int64)
+        wait = np.minimum(wait, skip + 1)
+        near = wait == 1
+        tiers[near] = 0
+        wait[near] = self.recheck
+        self.tier[indices] = tiers
+        self.next[indices] = self.tick + wait
+
+    def wake(self):
+        # Update every enemy next tick (the player has jumped somewhere new)
+        n = self.count
+        self.next[:n] = self.tick + 1
+
+    def coins(self, indices):
+        # A number in [0, 1) for each enemy at indices that depends only on
+        # the seed, the enemy and the tick (a splitmix64 hash)
+        z = self.serial[indices].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        z += np.uint64((self.seed + self.tick * 0xD1B54A32D192ED03) % (1 << 64))
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+        return (z >> np.uint64(11)) * (1.0 / (1 << 53))
+
+    def lod_stats(self):
+        total = self.updates + self.skipped
+        if total == 0:
+            return "no updates"
+        n = self.count
+        tiers = np.bincount(self.tier[:n][self.state[:n] == ACTIVE], minlength=3)
+        return "near {}, mid {}, far {}, {:.0f}% of enemy updates skipped".format(
+            tiers[0], tiers[1], tiers[2], self.skipped / total * 100)
+
+    def steer_towards(self, indices, px, py, range, amount):
+        # Nudge velocity toward (px, py) on each axis within range;
+        # a negative amount steers away
+        for position, velocity, target in ((self.x, self.dx, px), (self.y, self.dy, py)):
+            p = position[indices]
+            below = indices[(p < target) & (target - p < range)]
+            above = indices[(p > target) & (p - target < range)]
+            velocity[below] += amount
+            velocity[above] -= amount
+
+    def update_grid(self, grid):
+        # Re-bucket only the live enemies that crossed a cell boundary
+        n = self.count
+        if n == 0:
+            return
+        cols = np.floor_divide(self.x[:n], grid.cell_size).astype(np.int64)
+        rows = np.floor_divide(self.y[:n], grid.cell_size).astype(np.int64)
+        moved = (cols != self.col[:n]) | (rows != self.row[:n])
+        moved &= self.state[:n] == ACTIVE
+        for i in np.flatnonzero(moved):
+            grid.move(self.enemies[i])
+        self.col[:n] = cols
+        self.row[:n] = rows
+
+    def clearance(self, cell_size):
+        # Coarse occupancy grid over the arena (indexed [col, row]) turned
+        # into the distance, in cells, from each cell to the nearest cell
+        # holding a live enemy. Cost depends on the grid size, not the swarm.
+        cols = int(math.ceil(self.width / cell_size))
+        rows = int(math.ceil(self.height / cell_size))
+        n = self.count
+        live = self.state[:n] == ACTIVE
+        col = ((self.x[:n][live] + self.width / 2) // cell_size).astype(np.int64)
+        row = ((self.y[:n][live] + self.height / 2) // cell_size).astype(np.int64)
+        occupied = np.zeros((cols, rows), dtype=bool)
+        occupied[np.clip(col, 0, cols - 1), np.clip(row, 0, rows - 1)] = True
+
+        # Grow the occupied area one ring of cells at a time
+        distance = np.full((cols, rows), cols + rows, dtype=np.int64)
+        reached = occupied
+        d = 0
+        while reached.any() and not reached.all():
+            distance[reached & (distance > d)] = d
+            grown = reached.copy()
+            grown[1:, :] |= reached[:-1, :]
+            grown[:-1, :] |= reached[1:, :]
+            reached = grown.copy()
+            reached[:, 1:] |= grown[:, :-1]
+            reached[:, :-1] |= grown[:, 1:]
+            d += 1
+        distance[reached & (distance > d)] = d
+        return distance
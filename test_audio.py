@@ -0,0 +1,35 @@
+import numpy as np
+from audio import Mixer
+
+
+def make_mixer(**options):
+    mixer = Mixer(None, sounds=(), start=False, **options)
+    mixer.sounds["long.wav"] = np.full((5000, 2), 0.25, dtype=np.float32)
+    mixer.sounds["short.wav"] = np.full((1500, 2), 0.25, dtype=np.float32)
+    return mixer
+
+
+def test_sounds_of_different_lengths_finish():
+    # The short sound finishes first, behind the long one
+    mixer = make_mixer()
+    mixer.play("long.wav")
+    mixer.play("short.wav")
+    blocks = [mixer.mix(1024) for _ in range(6)]
+    assert mixer.voices == []
+    assert mixer.played == 2
+    samples = np.frombuffer(b"".join(blocks), dtype="<i2").reshape(-1, 2)
+    assert samples[0, 0] == int(0.5 * 0.5 * 32767)
+    assert samples[2000, 0] == int(0.25 * 0.5 * 32767)
+    assert samples[5000, 0] == 0
+
+
+def test_stealing_a_voice():
+    mixer = make_mixer(max_voices=1)
+    mixer.play("long.wav")
+    mixer.mix(1024)
+    mixer.play("short.wav")
+    mixer.mix(1024)
+    assert mixer.stolen == 1
+    assert [voice[0] is mixer.sounds["short.wav"] for voice in mixer.voices] == [True]
+    mixer.mix(1024)
+    assert mixer.voices == []
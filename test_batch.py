@@ -0,0 +1,18 @@
+import arena
+from arena import Sprite, Player
+from batch import apply_settings, restore_settings
+
+
+def test_class_attributes_override_game_speed():
+    # Whatever order the grid gives them in
+    before = (arena.game_speed, Sprite.max_dx, Sprite.max_dy, Player.max_dx)
+    for settings in ({"Sprite.max_dx": 0.5, "game_speed": 0.4}, {"game_speed": 0.4, "Sprite.max_dx": 0.5}):
+        saved = apply_settings(settings)
+        try:
+            assert arena.game_speed == 0.4
+            assert Sprite.max_dx == 0.5
+            assert Sprite.max_dy == 5 * 0.4
+            assert Player.max_dx == 10 * 0.4
+        finally:
+            restore_settings(saved)
+        assert (arena.game_speed, Sprite.max_dx, Sprite.max_dy, Player.max_dx) == before
@@ -0,0 +1,42 @@
+import random
+from types import SimpleNamespace
+import numpy as np
+import collision
+from arena import Sprite
+
+
+def box(x, y, width, height):
+    return SimpleNamespace(x=x, y=y, width=width, height=height, on_screen=True)
+
+
+def brute_force(attackers, targets):
+    return np.array([[Sprite.is_collision(attacker, target) for target in targets] for attacker in attackers],
+                    dtype=bool).reshape(len(attackers), len(targets))
+
+
+def random_boxes(rng, n):
+    # Small whole-number positions and sizes, so plenty of boxes overlap and
+    # plenty touch exactly at an edge
+    return [box(rng.randint(-20, 20), rng.randint(-20, 20), rng.randint(1, 24), rng.randint(1, 24))
+            for _ in range(n)]
+
+
+def test_hit_matrix_matches_is_collision():
+    rng = random.Random(4)
+    for _ in range(200):
+        attackers = random_boxes(rng, rng.randint(0, 12))
+        targets = random_boxes(rng, rng.randint(0, 12))
+        hits = collision.hit_matrix(collision.boxes(attackers), collision.boxes(targets))
+        assert hits.shape == (len(attackers), len(targets))
+        assert (hits == brute_force(attackers, targets)).all()
+
+
+def test_touching_edges_are_not_hits():
+    target = box(0, 0, 20, 20)
+    touching = [box(20, 0, 20, 20), box(-20, 0, 20, 20), box(0, 20, 20, 20), box(0, -20, 20, 20),
+                box(20, 20, 20, 20), box(12, 0, 4, 4)]
+    overlapping = [box(19.5, 0, 20, 20), box(0, -19, 20, 20), box(11.5, 11.5, 4, 4), box(0, 0, 4, 4)]
+    attackers = touching + overlapping
+    hits = collision.hit_matrix(collision.boxes(attackers), collision.boxes([target]))
+    assert hits[:, 0].tolist() == [False] * len(touching) + [True] * len(overlapping)
+    assert (hits == brute_force(attackers, [target])).all()
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+import netcode
+import server
+from arena import *
+from batch import bot
+
+
+def body(message):
+    return message[netcode.LENGTH.size + 1:]
+
+
+def snapshot(sequence, base, history, game):
+    # Body of the snapshot a client at base would be sent
+    records = history[sequence]
+    if base is None:
+        removed = np.zeros(0, dtype="<u4")
+        changed = records
+    else:
+        removed, changed = netcode.diff(history[base], records)
+    return body(netcode.snapshot_message(sequence, base, game, removed, changed))
+
+
+def test_snapshots_round_trip():
+    # One mirror is sent every snapshot and another every third one, diffed
+    # against the last it was sent, while sprites come and go: missiles and
+    # explosions leave and come back out of their pools with the same id,
+    # and destroyed enemies' swarm slots are refilled
+    game = Game(2000, 2000, seed=7)
+    game.level = 4
+    game.start_level()
+    game.start()
+    game.player.lives = 50
+    ids = {}
+    history = {}
+    every = netcode.Mirror()
+    sometimes = netcode.Mirror()
+    enemy_ids = {}
+    slots = {}
+    spawned = despawned = returned = reused = 0
+    gone = set()
+
+    for tick in range(1, 2001):
+        bot(game, tick)
+        game.update()
+        history[tick] = records = netcode.capture(game, ids)
+        every.apply(snapshot(tick, tick - 1 if tick > 1 else None, history, game))
+        assert len(every.records) == len(records)
+        assert (every.records == records).all()
+        if tick % 3 == 1:
+            sometimes.apply(snapshot(tick, sometimes.sequence, history, game))
+            assert (sometimes.records == records).all()
+            assert sometimes.ghosts.keys() == set(records["id"].tolist())
+
+        assert every.state == game.state
+        assert every.enemy_count == game.enemy_count
+        assert every.player.score == game.player.score
+
+        # Positions come back to within half a quantization step
+        for sprite in [game.player] + game.missiles.active():
+            ghost = every.ghosts[netcode.PLAYER_ID if sprite is game.player else ids[sprite]]
+            assert abs(ghost.x - sprite.x) <= 0.5 / netcode.POSITION_SCALE
+            assert abs(ghost.y - sprite.y) <= 0.5 / netcode.POSITION_SCALE
+
+        # An enemy keeps its id when it moves to another slot
+        swarm = game.swarm
+        for i, enemy in enumerate(swarm.enemies):
+            key = netcode.ENEMY_ID + int(swarm.serial[i])
+            assert enemy_ids.setdefault(enemy, key) == key
+            if slots.get(i, enemy) is not enemy:
+                reused += 1
+            slots[i] = enemy
+
+        if tick > 1:
+            before = set(history[tick - 1]["id"].tolist())
+            now = set(records["id"].tolist())
+            spawned += len(now - before)
+            despawned += len(before - now)
+            returned += len(gone & (now - before))
+            gone |= before - now
+
+    assert spawned > 100 and despawned > 100
+    assert returned > 0
+    assert reused > 0
+
+
+def test_mirror_rejects_a_snapshot_for_another_base():
+    game = Game(2000, 2000, seed=1)
+    game.start_level()
+    game.start()
+    history = {1: netcode.capture(game, {})}
+    game.update()
+    history[2] = netcode.capture(game, {})
+    mirror = netcode.Mirror()
+    with pytest.raises(ValueError):
+        mirror.apply(snapshot(2, 1, history, game))
+
+
+def test_arena_size_bounds():
+    # Positions at the edge of the biggest arena still fit the records
+    half = netcode.MAX_ARENA_SIZE // 2
+    assert half * netcode.POSITION_SCALE <= 32767
+    game = Game(netcode.MAX_ARENA_SIZE, netcode.MAX_ARENA_SIZE, seed=1)
+    game.start_level()
+    game.start()
+    game.player.x = half
+    game.player.y = -half
+    mirror = netcode.Mirror()
+    mirror.apply(body(netcode.snapshot_message(1, None, game, np.zeros(0, dtype="<u4"),
+                                               netcode.capture(game, {}))))
+    assert mirror.player_position() == (half, -half)
+
+    server.Arena("biggest", netcode.MAX_ARENA_SIZE, netcode.MAX_ARENA_SIZE)
+    with pytest.raises(ValueError):
+        server.Arena("too big", netcode.MAX_ARENA_SIZE + 2, netcode.MAX_ARENA_SIZE + 2)
+    for size in (netcode.MAX_ARENA_SIZE + 2, 2001, 0):
+        with pytest.raises(SystemExit):
+            server.main(["--size", str(size)])
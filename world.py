@@ -0,0 +1,68 @@
+# Space Arena world
+# Live entities kept in one collection per kind, so each per-frame pass
+# walks only the things it cares about and dead entities drop out as soon
+# as they die instead of lingering until the next level.
+
+
+class EntityList:
+    # Unordered collection with O(1) add and remove: removing an entity
+    # moves the last one into its place
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, entity):
+        return entity in self.positions
+
+    def add(self, entity):
+        self.positions[entity] = len(self.items)
+        self.items.append(entity)
+
+    def remove(self, entity):
+        i = self.positions.pop(entity)
+        last = self.items.pop()
+        if last is not entity:
+            self.items[i] = last
+            self.positions[last] = i
+
+    def clear(self):
+        self.items.clear()
+        self.positions.clear()
+
+
+class World:
+    def __init__(self, player, missiles, enemy_missiles, bombs, explosions):
+        self.player = player
+
+        # Pooled sprites: the pools track which ones are live
+        self.missiles = missiles.in_use
+        self.enemy_missiles = enemy_missiles.in_use
+        self.bombs = bombs.in_use
+        self.explosions = explosions.in_use
+
+        # Per-level sprites
+        self.enemies = EntityList()
+        self.powerups = EntityList()
+
+    def clear(self):
+        self.enemies.clear()
+        self.powerups.clear()
+
+    def __iter__(self):
+        # Every live sprite except explosions, in drawing order
+        yield from self.enemy_missiles
+        yield self.player
+        yield from self.missiles
+        yield from self.bombs
+        yield from self.enemies
+        yield from self.powerups
+
+    def __len__(self):
+        return len(self.enemy_missiles) + 1 + len(self.missiles) + len(self.bombs) + \
+            len(self.enemies) + len(self.powerups)